@@ -1,5 +1,46 @@
 import pytest
+import simpy
+from simulation.pending_requests import PendingRequests
+from simulation.slot_manager import SlotManager
 
 
 def test_name():
     assert True
+
+
+class Request(object):
+    def __init__(self, id, send_id, timestamp):
+        self.id = id
+        self.send_id = send_id
+        self.timestamp = timestamp
+
+
+def test_pending_request_sent_before_end_is_not_lost():
+    pending = PendingRequests(timeout=10)
+    pending.add(Request(0, "client", 0))
+    pending.add(Request(1, "client", 29.995))
+    pending.expire(30)
+    assert pending.get_lost(30) == {"client": 1}
+
+
+class SlotEnvironment(simpy.Environment):
+    def update_node_load(self, node):
+        pass
+
+
+def test_slot_kept_at_exact_expiry():
+    env = SlotEnvironment()
+    slots = SlotManager(env, None, 1, expiry=2)
+    connected = []
+
+    def client():
+        yield env.timeout(1)
+        slots.refresh("client")
+        yield env.timeout(2)
+        connected.append("client" in slots)
+
+    env.process(client())
+    env.run(until=4)
+    assert connected == [True]
+    assert "client" not in slots
+    assert slots.free_slots == 1
@@ -4,9 +4,9 @@ from simulation.node import FogNode
 from simulation.celltower import Celltower
 from simulation.metrics import Metrics
 from simulation.fog_environment import FogEnvironment
-import xml.etree.ElementTree as et
+from simulation.scenario_cache import ScenarioCache
 import uuid
-import geopandas as gpd
+import numpy as np
 import yaml
 from pathlib import Path
 from random import Random
@@ -49,10 +49,11 @@ def main():
     # Init Environment
     print("Preparing Environment")
     env = FogEnvironment(config)
-    # Reading Client movement patterns
-    client_data = et.parse(client_path)
-    # Reading Node coordinates from json
-    nodes_gdf = gpd.read_file(nodes_path)
+    # Binary cache of the preprocessed cell towers and client trips, the inputs are only parsed if they changed
+    cache_path = config["simulation"].get("cache")
+    cache = ScenarioCache(base_path.joinpath(cache_path) if cache_path not in (None, "None") else None)
+    # Reading Cell Tower coordinates and antennas
+    tower_x, tower_y, tower_antennas = cache.load_celltowers(nodes_path)
 
 # ------------------------------------------------------
 # ------------------ Area Selection --------------------
@@ -64,7 +65,8 @@ def main():
         (x_lower, x_upper, y_lower, y_upper) = (
             config["map"]["x_min"], config["map"]["x_max"], config["map"]["y_min"], config["map"]["y_max"])
         env.boundaries = (x_lower, x_upper, y_lower, y_upper)
-        filtered_nodes_gdf = nodes_gdf.cx[x_lower:x_upper, y_lower:y_upper]
+        filtered_towers = np.flatnonzero((x_lower <= tower_x) & (tower_x <= x_upper) &
+                                         (y_lower <= tower_y) & (tower_y <= y_upper))
 
     else:
         while True:
@@ -72,9 +74,10 @@ def main():
             (x_lower, x_upper, y_lower, y_upper) = env.generate_boundaries(
                 config["simulation"]["area"], config["simulation"]["area"], method=config["simulation"]["area_selection"])
             # Filter Nodes within boundary
-            filtered_nodes_gdf = nodes_gdf.cx[x_lower:x_upper, y_lower:y_upper]
+            filtered_towers = np.flatnonzero((x_lower <= tower_x) & (tower_x <= x_upper) &
+                                             (y_lower <= tower_y) & (tower_y <= y_upper))
             # Check if area is valid
-            if(not min_nodes or len(filtered_nodes_gdf) >= min_nodes):
+            if(not min_nodes or len(filtered_towers) >= min_nodes):
                 env.boundaries = (x_lower, x_upper, y_lower, y_upper)
                 break
 
@@ -86,28 +89,28 @@ def main():
 # ------------------------------------------------------
     # Slot counter to calculate the client ratio later on
     total_slots = 0
-    for index, node_entry in filtered_nodes_gdf.iterrows():
+    for index in filtered_towers:
 
-        node_id = uuid.uuid4()
-        cell_id = uuid.uuid4()
+        cell_id = env.create_id(uuid.uuid4())
         # Place Cell Towers
         celltower = Celltower(env, id=cell_id,
-                              phy_x=node_entry["geometry"].x,
-                              phy_y=node_entry["geometry"].y,
+                              phy_x=float(tower_x[index]),
+                              phy_y=float(tower_y[index]),
                               verbose=config["simulation"]["verbose"])
-        env.celltowers.append({"id": cell_id, "obj": celltower})
+        env.add_participant(celltower)
 
         # Only if the berlin scenario is active, the Fog Nodes are placed with the Cell Towers
         if scenario == "berlin":
+            node_id = env.create_id(uuid.uuid4())
             # in 50% of the time the node is placed randomly in the area, the other times the Fog Node is at the cell tower
             decision = my_random.randint(1, 100) < 50
             node_x = my_random.randint(round(x_lower), round(
-                x_upper)) if decision else node_entry["geometry"].x
+                x_upper)) if decision else float(tower_x[index])
             node_y = my_random.randint(round(y_lower), round(
-                y_upper)) if decision else node_entry["geometry"].y
+                y_upper)) if decision else float(tower_y[index])
             # Calculate amount of slots depending on the settings
             slots = slots = float('inf') if unlimited_bandwidth else math.ceil(
-                node_entry["Antennas"] * config["nodes"]["slot_scaler"] + 0.1)
+                tower_antennas[index] * config["nodes"]["slot_scaler"] + 0.1)
             # Place Fog Nodes
             node = FogNode(env, id=node_id,
                            discovery_protocol=config["simulation"]["discovery_protocol"],
@@ -116,7 +119,7 @@ def main():
                            phy_x=node_x,
                            phy_y=node_y,
                            verbose=config["simulation"]["verbose"])
-            env.nodes.append({"id": node_id, "obj": node})
+            env.add_participant(node)
             total_slots += slots
             # Break out of loop of max_nodes is defined and is reached
             if isinstance(max_nodes, int) and len(env.nodes) >= max_nodes:
@@ -125,9 +128,9 @@ def main():
     # Placing nodes for the germany scenario
     if scenario == "germany":
         for city, coordinates in cities.items():
-            node_id = uuid.uuid4()
+            node_id = env.create_id(uuid.uuid4())
             slots = float('inf') if unlimited_bandwidth else math.ceil(
-                node_entry["Antennas"] * config["nodes"]["slot_scaler"])
+                tower_antennas[index] * config["nodes"]["slot_scaler"])
             node = FogNode(env, id=node_id,
                            discovery_protocol=config["simulation"]["discovery_protocol"],
                            slots=slots,
@@ -135,31 +138,28 @@ def main():
                            phy_x=coordinates[0],
                            phy_y=coordinates[1],
                            verbose=config["simulation"]["verbose"])
-            env.nodes.append({"id": node_id, "obj": node})
+            env.add_participant(node)
             total_slots += slots
 
     print("Active Fog Nodes: {} with {} slots".format(
         len(env.nodes), total_slots))
+    # Cell towers and Fog Nodes do not move, so the spatial index is only built once
+    env.build_celltower_index()
+    env.build_node_index()
+    env.build_latency_engine()
 
 # ------------------------------------------------------
 # ------------------ Mobile Clients --------------------
 # ------------------------------------------------------
 
-    client_plans = client_data.getroot().findall('person')
-    # Pre-filter all clients within the simulation area
-    if scenario == "berlin":
-        client_plans = list(filter(lambda client: x_lower < float(client.find('trip').attrib["x"]) < x_upper and
-                                   y_lower < float(client.find('trip').attrib["y"]) < y_upper, client_plans))
-
     if unlimited_bandwidth and not isinstance(max_clients, int):
         warnings.warn(
             "Unlimited bandwidth and no max_clients can lead to a very high amount of clients in the simulation")
 
     # With unlimited bandwidth we take the max numbers of clients if defined
-    # else the max amount of clients available
+    # else all clients available
     if unlimited_bandwidth:
-        max_clients = min(max_clients, len(client_plans)) if isinstance(
-            max_clients, int) else len(client_plans)
+        max_clients = max_clients if isinstance(max_clients, int) else None
     # With limited bandwidth we take the minimum of client ratio and max numbers of clients if defined,
     # else the client ratio
     else:
@@ -167,18 +167,21 @@ def main():
             max_clients, int) else total_slots * client_ratio
         max_clients = round(max_clients)
 
-    # Loop over clients randomly sampled from the Open Berlin Scenario until max_clients is reached
-    for client_plan in my_random.sample(client_plans, max_clients):
-        # A client is valid for the simulation if the scenario is for whole germany or the client is within the boundaries
-        client_id = client_plan.get("id")
-        client = MobileClient(env, id=client_id, plan=client_plan,
+    # Stream the clients from the Open Berlin Scenario and randomly sample max_clients of them while reading
+    # A client is valid for the simulation if the scenario is for whole germany or the client is within the boundaries
+    client_plans = cache.load_plans(client_path, bounds=env.boundaries if scenario == "berlin" else None,
+                                    max_clients=max_clients, sampler=my_random)
+    max_clients = len(client_plans) if max_clients is None else max_clients
+    for index in range(len(client_plans)):
+        client_id = env.create_id(client_plans.get_id(index))
+        client = MobileClient(env, id=client_id, trips=client_plans.get_trips(index),
                               discovery_protocol=config["simulation"]["discovery_protocol"],
                               latency_threshold=config["clients"]["latency_threshold"],
                               roundtrip_threshold=config["clients"]["roundtrip_threshold"],
                               timeout_threshold=config["clients"]["timeout_threshold"],
                               verbose=config["simulation"]["verbose"])
         # Add client to list
-        env.clients.append({"id": client_id, "obj": client})
+        env.add_participant(client)
 
     print("Active clients: {}, Max clients: {}".format(
         len(env.clients), max_clients))
@@ -198,6 +201,8 @@ def main():
 # -----------------------------------------------------------
     print("Starting simulation")
     env.run(until=config["simulation"]["runtime"])
+    print("Latency cache: {} hits, {} misses, hit rate {:.2f}".format(
+        env.latency_cache.hits, env.latency_cache.misses, env.latency_cache.hit_rate()))
 
 # -----------------------------------------------------------
 # ------------------ Collect Metrics after Simulation -------
@@ -205,7 +210,12 @@ def main():
     metrics_collector = Metrics(env)
     # Collecting client metrics
     client_metrics = metrics_collector.all_client()
-    client_metrics = client_metrics.dropna()
+    if env.oracle.mode == "eager":
+        client_metrics = client_metrics.dropna()
+    else:
+        # The oracle columns are NaN for clients without evaluated messages or if the oracle is off, they must not drop the client
+        client_metrics = client_metrics.dropna(subset=["reconnections", "lat_mean", "lat_max", "lat_min", "total_msgs",
+                                                       "out_msgs", "in_msgs", "lost_msgs", "active_time"])
     client_metrics.to_csv("Germany_Client_Metrics_{}_{}.csv".format(
         config["simulation"]["discovery_protocol"], config["clients"]["client_ratio"]))
     print(client_metrics)
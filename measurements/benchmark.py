@@ -0,0 +1,183 @@
+import sys
+import gc
+import multiprocessing
+import random
+import resource
+import time
+import tracemalloc
+import uuid
+import xml.etree.ElementTree as et
+import yaml
+from pathlib import Path
+
+# Make the simulation package importable when the script is run from the measurements folder
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent))
+from simulation.fog_environment import FogEnvironment
+from simulation.node import FogNode
+from simulation.celltower import Celltower
+from simulation.message import Message
+from simulation.plans import TripPlans
+
+
+def create_environment(amount_nodes=20, gossip_size=20):
+    """Creates a small Fog Environment with Fog Nodes and Cell Towers on a grid
+
+    Args:
+        amount_nodes (int, optional): Amount of Fog Nodes and Cell Towers. Defaults to 20.
+        gossip_size (int, optional): Amount of gossip entries of every node. Defaults to 20.
+
+    Returns:
+        FogEnvironment: The environment
+    """
+    config = {"simulation": {"runtime": 1, "verbose": False}}
+    env = FogEnvironment(config)
+    env.amount_nodes = amount_nodes
+    for i in range(amount_nodes):
+        x, y = 4590000 + (i % 5) * 300, 5820000 + (i // 5) * 300
+        cell_id = env.create_id(uuid.uuid4())
+        env.add_participant(Celltower(env, cell_id, x, y))
+        node_id = env.create_id(uuid.uuid4())
+        env.add_participant(FogNode(env, node_id, "baseline", slots=4, hardware=1,
+                                    phy_x=x + 50, phy_y=y + 50, verbose=False))
+    # Fill up the gossip of the nodes to the given size
+    for node in env.nodes:
+        for other in env.nodes[:gossip_size]:
+            if other["id"] != node["id"]:
+                node["obj"].gossip.store(other["obj"].gossip.get_own())
+    env.build_celltower_index()
+    env.build_latency_engine()
+    return env
+
+
+def benchmark_message_memory(amount_messages=10000, gossip_size=20):
+    """Measures the memory of Messages with tracemalloc
+    Reports the memory per message while all messages are held in a list
+    and the memory still held by the last message of a request/response chain after all other references are dropped
+
+    Args:
+        amount_messages (int, optional): Amount of messages to create. Defaults to 10000.
+        gossip_size (int, optional): Amount of gossip entries of the sender. Defaults to 20.
+
+    Returns:
+        dict: bytes per message and bytes retained by the last message of a chain per message of the chain
+    """
+    env = create_environment(gossip_size=gossip_size)
+    sender = env.nodes[0]["obj"]
+    receiver = env.nodes[1]["obj"]
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    messages = []
+    prev_msg = None
+    for i in range(amount_messages):
+        prev_msg = Message(env, i, sender.id, receiver.id, "Benchmark", 3,
+                           sender.share_gossip(receiver.id), response=prev_msg is not None, prev_msg=prev_msg)
+        messages.append(prev_msg)
+    held, _ = tracemalloc.get_traced_memory()
+    # Only keep the last message of the chain
+    del messages
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"bytes_per_message": (held - start) / amount_messages,
+            "retained_per_chain_message": (retained - start) / amount_messages}
+
+
+def benchmark_gossip_exchange(amount_nodes=20, amount_messages=10000):
+    """Measures the gossip exchange between Fog Nodes which message random peers
+    Every node starts with the news of all other nodes, so only the own news and recent changes are exchanged
+
+    Args:
+        amount_nodes (int, optional): Amount of Fog Nodes. Defaults to 20.
+        amount_messages (int, optional): Amount of messages to exchange. Defaults to 10000.
+
+    Returns:
+        dict: gossip entries per message and microseconds per merge
+    """
+    env = create_environment(amount_nodes=amount_nodes, gossip_size=amount_nodes)
+    nodes = [node["obj"] for node in env.nodes]
+    rand = random.Random(0)
+    entries = 0
+    merge_time = 0
+    for i in range(amount_messages):
+        sender, receiver = rand.sample(nodes, 2)
+        message = Message(env, i, sender.id, receiver.id, "Benchmark", 3,
+                          sender.share_gossip(receiver.id))
+        entries += len(message.gossip)
+        start = time.perf_counter()
+        receiver.update_gossip(message)
+        merge_time += time.perf_counter() - start
+    return {"entries_per_message": entries / amount_messages,
+            "merge_us": merge_time / amount_messages * 1e6}
+
+
+def load_plans(loader, path, bounds, max_clients, results):
+    """Loads the plans XML with the given loader, runs in a separate process so the peak RSS only covers this load
+
+    Args:
+        loader (str): Either dom for parsing the whole document and filtering afterwards or streaming for TripPlans.from_file
+        path (str): Path of the plans XML
+        bounds (tuple): x_lower, x_upper, y_lower, y_upper of the area
+        max_clients (int): Amount of plans to be sampled
+        results (multiprocessing.Queue): Queue the measurements are put into
+    """
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if loader == "dom":
+        persons = [person for person in et.parse(path).getroot().findall('person')
+                   if person.find('trip') is not None and
+                   bounds[0] < float(person.find('trip').attrib["x"]) < bounds[1] and
+                   bounds[2] < float(person.find('trip').attrib["y"]) < bounds[3]]
+        plans = TripPlans.from_persons(random.Random(0).sample(persons, min(max_clients, len(persons))))
+    else:
+        plans = TripPlans.from_file(path, bounds=bounds, max_clients=max_clients, sampler=random.Random(0))
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    results.put({"seconds": seconds, "clients": len(plans),
+                 "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                 "baseline_rss_mb": baseline / 1024})
+
+
+def benchmark_plans_loading(path, bounds, max_clients=1000):
+    """Measures load time and peak RSS of parsing the whole plans XML against the streaming loader
+    Every loader runs in a fresh process
+
+    Args:
+        path (str|Path): Path of the plans XML, e.g. the 10pct file of the open berlin scenario
+        bounds (tuple): x_lower, x_upper, y_lower, y_upper of the area
+        max_clients (int, optional): Amount of plans to be sampled. Defaults to 1000.
+
+    Returns:
+        dict: Loader -> seconds, amount of loaded clients, peak RSS and RSS before loading in MB
+    """
+    context = multiprocessing.get_context("spawn")
+    measurements = {}
+    for loader in ("dom", "streaming"):
+        results = context.Queue()
+        process = context.Process(target=load_plans, args=(loader, str(path), bounds, max_clients, results))
+        process.start()
+        measurements[loader] = results.get()
+        process.join()
+    return measurements
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    memory = benchmark_message_memory()
+    print("Message memory: {:.1f} bytes per message, {:.1f} bytes per message retained by a response chain ({:.2f} s)".format(
+        memory["bytes_per_message"], memory["retained_per_chain_message"], time.perf_counter() - start))
+    start = time.perf_counter()
+    gossip = benchmark_gossip_exchange()
+    print("Gossip exchange: {:.1f} entries per message, {:.1f} us per merge ({:.2f} s)".format(
+        gossip["entries_per_message"], gossip["merge_us"], time.perf_counter() - start))
+    base_path = Path(__file__).absolute().parent.parent
+    with open(base_path.joinpath("config.yml"), "r") as ymlfile:
+        config = yaml.load(ymlfile, Loader=yaml.FullLoader)
+    plans_path = base_path.joinpath(config["clients"]["path"])
+    if plans_path.exists():
+        bounds = (config["map"]["x_min"], config["map"]["x_max"], config["map"]["y_min"], config["map"]["y_max"])
+        for loader, loading in benchmark_plans_loading(plans_path, bounds).items():
+            print("Plans loading ({}): {} clients in {:.2f} s, peak RSS {:.1f} MB ({:.1f} MB before loading)".format(
+                loader, loading["clients"], loading["seconds"], loading["peak_rss_mb"], loading["baseline_rss_mb"]))
+    else:
+        print("Plans loading: skipped, {} not found".format(plans_path))
@@ -8,25 +8,27 @@ from .reconnection_rules import ReconnectionRules
 from vivaldi.vivaldiposition import VivaldiPosition
 import time
 import numpy as np
+from collections import deque
+from .gossip import GossipTable
 
 
 class MobileClient(object):
-    def __init__(self, env, id, plan, discovery_protocol, latency_threshold=0.005, roundtrip_threshold=1.2, timeout_threshold=2, verbose=True):
+    def __init__(self, env, id, trips, discovery_protocol, latency_threshold=0.005, roundtrip_threshold=1.2, timeout_threshold=2, verbose=True, history_window=10):
         """Initializes a Mobile Client
 
         Args:
             env (FogEnvironment): Fog Environment of the simulation
             id (uuid): The ID of the Client
-            plan (XML object): The XML Object of the Client from the reduced open berlin scenario
+            trips (tuple): x coordinates, y coordinates and travel times of the Client's trips from the reduced open berlin scenario, as compiled by TripPlans
             discovery_protocol (str): The discovery protocol used for the simulation
             latency_threshold (float, optional): latency threshold in seconds of the client's reconnection rules. Defaults to 0.005.
             roundtrip_threshold (float, optional): roundtrip threshold in seconds of the client's reconnection rules. Defaults to 0.010.
             timeout_threshold (int, optional): timeout threshold in seconds of the client's reconnection rules. Defaults to 0.100.
             verbose (bool, optional): Verbosity of the client. Defaults to True.
+            history_window (int, optional): Amount of recent messages kept in the in and out history, all messages are kept in the message log of the environment. Defaults to 10.
         """
         self.env = env
         self.id = id
-        self.plan = plan.findall('trip')
         self.connected = False
         self.verbose = verbose
         # ID of closest node as string
@@ -38,28 +40,29 @@ class MobileClient(object):
         # Event triggers search for closest node
         self.req_node_event = env.event()
         self.msg_pipe = simpy.FilterStore(env)
-        self.in_msg_history = []
-        self.out_msg_history = []
-        # Set coordinates to first activity in plan
-        self.phy_x = float(plan.find('trip').attrib["x"])
-        self.phy_y = float(plan.find('trip').attrib["y"])
+        # Only recent windows are kept for the reconnection rules
+        self.in_msg_history = deque(maxlen=history_window)
+        self.out_msg_history = deque(maxlen=history_window)
+        # Start at the first activity in plan, the position along the trips is interpolated by the mobility store of the environment
+        self.mobility_index = env.mobility.add_client(trips)
         if self.verbose:
             print("Client {}: active, current location x: {}, y: {}".format(
-                self.id, self.phy_x, self.phy_y))
+                self.id, *self.get_coordinates()))
         # Starting the operating processes
-        self.my_random = Random(self.id)
+        # Seeded with the ID from the plans XML to keep the random streams reproducible
+        self.my_random = Random(self.env.get_external_id(self.id))
         start_up = self.my_random.randint(3000, 10000)/1000
         self.out_process = self.env.process(self.out_connect(start_up))
         self.in_process = self.env.process(self.in_connect())
         self.move_process = self.env.process(self.move(start_up))
-        self.monitor_process = self.env.process(self.monitor())
         self.stop_event = env.event()
+        self.stop_event.callbacks.append(self.handle_stop)
         # Init the virtual Position
         self.virtual_position = self.init_virtual_position(discovery_protocol)
         self.discovery_protocol = discovery_protocol
-        # Gossip of all nodes
-        self.gossip = [
-            {"id": self.id, "position": self.get_virtual_position(), "timestamp": env.now, "type": type(self).__name__}]
+        # Versioned gossip of all nodes, only the changes since the last exchange are sent to a peer
+        self.gossip = GossipTable(self.id, {"position": self.get_virtual_position(), "timestamp": env.now,
+                                            "type": type(self).__name__})
         self.move_performance = np.nan
         self.out_performance = np.nan
         self.in_performance = np.nan
@@ -69,6 +72,7 @@ class MobileClient(object):
         """The move process of the client.
         Is started at the start of the simulation but waits the given start_up time
         Moves through the simulation area based on the open berlin scenario movement pattern
+        The position is interpolated along the legs of the trajectory, events are only scheduled at the end of a leg or when the client leaves the bounds
         Invokes the stop function if client is out of simulation area bounds or no more trips are available
         
         Args:
@@ -79,39 +83,21 @@ class MobileClient(object):
         yield self.env.timeout(start_up)
         if self.verbose:
             print("Client {}: starting move Process".format(self.id))
-        # Iterate through every leg & activity in seperate process
-        #for activity, leg in self.pairs:
-        for trip in self.plan:
-            trav_time = trip.attrib['trav_time']
-            duration = sum(x * int(t) for x, t in zip([3600, 60, 1], trav_time.split(":")))
-            to_x = float(trip.attrib['x'])
-            to_y = float(trip.attrib['y'])
-            # skip this leg, if the duration is lower than 1 second
-            if(duration < 1):
-                continue
-
-            dist_x = to_x - self.phy_x
-            dist_y = to_y - self.phy_y
-            vel_x = dist_x / duration
-            vel_y = dist_y / duration
-            # skip this leg if we are not going anywhere, threshold of 10 because sometimes its weird
-            if -10 < dist_x < 10 and -10 < dist_y < 10:
-                continue
-            # Moving until x and y match the end point of the leg
-            while(round(to_x, 2) != round(self.phy_x, 2) and round(to_y, 2) != round(self.phy_y, 2)):
-                start = time.perf_counter()
-                self.phy_x += vel_x
-                self.phy_y += vel_y
-                # Stop Client if it steps out of bounds
-                if not self.in_bounds():
-                    self.stop_event.succeed("Out of geographical bounds")
-                    self.stop_event = self.env.event()
-                try:
-                    yield self.env.timeout(1)
-                except simpy.Interrupt:
-                    return
-
-                self.move_performance = time.perf_counter() - start
+        mobility = self.env.mobility
+        mobility.start(self.mobility_index, self.env.now)
+        for leg in range(mobility.get_leg_count(self.mobility_index)):
+            start = time.perf_counter()
+            event_time, out_of_bounds = mobility.get_next_event(self.mobility_index, leg)
+            self.move_performance = time.perf_counter() - start
+            try:
+                yield self.env.timeout(max(0, event_time - self.env.now))
+            except simpy.Interrupt:
+                return
+            # Stop Client if it steps out of bounds
+            if out_of_bounds:
+                self.stop_event.succeed("Out of geographical bounds")
+                self.stop_event = self.env.event()
+                return
         # Client has no more activities so we stop
         self.stop_event.succeed("No more activities")
         self.stop_event = self.env.event()
@@ -131,20 +117,20 @@ class MobileClient(object):
         while (True):
             start = time.perf_counter()
             # If no node is registered or connection not valid, trigger the event to search for the closest node
-            if(not self.closest_node_id or not self.connection_valid()):
+            if(self.closest_node_id is None or not self.connection_valid()):
                 if self.verbose:
                     print("Client {}: Probing network".format(self.id))
-                if not self.closest_node_id:
+                if self.closest_node_id is None:
                     request_node = self.env.get_random_node()
                 else:
                     request_node = self.closest_node_id
                 out_msg = self.env.send_message(self.id, request_node,
-                                                "Request Closest node", gossip=self.gossip, msg_type=2)
+                                                "Request Closest node", gossip=self.share_gossip(request_node), msg_type=2)
                 self.out_msg_history.append(out_msg)
             # If closest node is registered, send messages to node
-            if self.closest_node_id:
+            if self.closest_node_id is not None:
                 out_msg = self.env.send_message(
-                self.id, self.closest_node_id, "Client {} sends a task".format(self.id), gossip=self.gossip)
+                self.id, self.closest_node_id, "Client {} sends a task".format(self.id), gossip=self.share_gossip(self.closest_node_id))
                 self.out_msg_history.append(out_msg)
             try:
                 yield self.env.timeout(self.my_random.randint(5, 10)/10)
@@ -167,15 +153,16 @@ class MobileClient(object):
             except simpy.Interrupt:
                 return
             start = time.perf_counter()
-            # Save timestamp of reception in message object
+            # Save timestamp of reception in message object and message log
             in_msg.rec_timestamp = self.env.now
+            self.env.receive_message(in_msg)
             # Append message to history
             self.in_msg_history.append(in_msg)
             # Update gossip
             self.update_gossip(in_msg)
             # Updating the virtual Position for every incoming message which is a response in the following
             # Checking if incoming message is a response on which a rtt can be calculated and virtual position is updated
-            if(in_msg.prev_msg):
+            if(in_msg.prev_msg_id is not None):
                 self.update_virtual_position(in_msg)
             # Extracting message Type
             msg_type = in_msg.msg_type
@@ -191,27 +178,26 @@ class MobileClient(object):
                     print("Client {}: {}".format(self.id, in_msg))
                 closest_node_id = in_msg.body
                 # If there are no slots available the Node returns none, so we want to check that
-                if closest_node_id:
+                if closest_node_id is not None:
                     self.closest_node_id = closest_node_id
             # Network probing performed by a node
             elif(msg_type == 3):
                 if self.verbose:
                     print("Client {}: {}".format(self.id, in_msg))
                 out_msg = self.env.send_message(
-                    self.id, in_msg.send_id, "Client {} response to ping".format(self.id), gossip=self.gossip, response = True, msg_type = 3, prev_msg = in_msg)
+                    self.id, in_msg.send_id, "Client {} response to ping".format(self.id), gossip=self.share_gossip(in_msg.send_id), response = True, msg_type = 3, prev_msg = in_msg)
                 self.out_msg_history.append(out_msg)
 
             self.in_performance = time.perf_counter() - start
 
-    def monitor(self):
-        """Monitor process for the client.
-        Invokes the stop method if the stop event is called
+    def handle_stop(self, event):
+        """Callback of the first stop event of the client
+        Invokes the stop method with the cause of the stop event, no process has to wait for the event
 
-        Yields:
-            simpy.Event: Stop event called with a cause
+        Args:
+            event (simpy.Event): Stop event called with a cause
         """
-        cause = yield self.stop_event
-        self.stop(cause)
+        self.stop(event.value)
 
     def connection_valid(self):
         """Checks all rules of the reconnection_rule.py
@@ -219,8 +205,8 @@ class MobileClient(object):
             boolean: If all the rules are fulfilled and the connection is currently valid
         """
         Rules = self.rules
-        tmp_out_history = self.out_msg_history[-10:]
-        tmp_in_history = self.in_msg_history[-10:]
+        tmp_out_history = list(self.out_msg_history)[-10:]
+        tmp_in_history = list(self.in_msg_history)[-10:]
         check = all([
             Rules.latency_rule(self.id, self.closest_node_id,
                                threshold=self.latency_threshold),
@@ -239,17 +225,19 @@ class MobileClient(object):
             boolean: Whether or not the client is in bounds
         """
         (x_lower, x_upper, y_lower, y_upper) = self.env.boundaries
-        if(x_lower < self.phy_x < x_upper and y_lower < self.phy_y < y_upper):
+        phy_x, phy_y = self.get_coordinates()
+        if(x_lower < phy_x < x_upper and y_lower < phy_y < y_upper):
             return True
         else:
             return False
 
     def stop(self, cause):
-        """Stops all client processes, should only be invoked by the monitor process
+        """Stops all client processes, should only be invoked by the callback of the stop event
 
         Args:
             cause (string): Description of the cause, that made the client stop
         """
+        self.env.mobility.stop(self.mobility_index, self.env.now)
         if(self.out_process.is_alive):
             self.out_process.interrupt(cause)
         if(self.in_process.is_alive):
@@ -301,49 +289,51 @@ class MobileClient(object):
                     "Node {} TypeError at update VivaldiPosition: {}".format(self.id, e))
 
     def calculate_rtt(self, in_msg):
-        """Calculates the round-trip-time (rtt) of the incoming message by comparing timestamps with the out message
+        """Returns the round-trip-time (rtt) of the incoming message
+        The rtt is resolved from the pending requests of the environment when the message is received
 
         Args:
-            in_msg (dict): Incoming message
+            in_msg (Message): Incoming message
 
         Returns:
             float: roundtrip time of the message
         """
-        msg_id = in_msg.id
-        out_msg = next(
-            (message for message in self.out_msg_history if message.id == in_msg.prev_msg.id), None)
-        rtt = self.env.now - out_msg.timestamp
+        rtt = in_msg.rtt
+        # The request already expired before the response arrived
+        if rtt is None:
+            rtt = self.env.now - self.env.message_log.get_timestamp(in_msg.prev_msg_id)
         return rtt
 
     def get_coordinates(self):
-        """Returns the physical coordinates of the client
+        """Returns the physical coordinates of the client at the current simulation time
 
         Returns:
             float: x coordinate of the node in GK4/EPSG:31468
             float: y coordinate of the node in GK4/EPSG:31468
         """
-        return self.phy_x, self.phy_y
+        return self.env.mobility.get_position(self.mobility_index, self.env.now)
+
+    def share_gossip(self, rec_id):
+        """Returns the gossip for a message to the given recipient
+        The own news is brought up to date first, only the entries changed since the last message to the recipient are shared
+
+        Args:
+            rec_id (int): ID of the recipient
+
+        Returns:
+            tuple: The changed gossip entries including the own news
+        """
+        self.gossip.update_own(self.env.now, position=self.get_virtual_position())
+        return self.gossip.delta(rec_id)
 
     def update_gossip(self, in_msg):
         """Updates the own gossip with the gossip from the in message
+        Only entries with a newer version than the own entry are taken over, unknown entries only if they are in the gossip scope
 
         Args:
-            in_msg (list[dict]): An incoming message from another participant
+            in_msg (Message): An incoming message from another participant
         """
-        in_gossip = in_msg.gossip
-        for news in in_gossip:
-            # If the node is not in own gossip add it
-            if not any(entry.get("id") == news["id"] for entry in self.gossip):
-                self.gossip.append(news)
-            # Update own gossip if the news is newer than own news
-            else:
-                #own_news = (entry.get("id") == news["id"] for entry in self.gossip)
-                own_news = next(
-                    (entry for entry in self.gossip if entry["id"] == news["id"]), None)
-                # keep own gossip up to date
-                if news["id"] == self.id:
-                    own_news.update(
-                        {"position": self.get_virtual_position(), "timestamp": self.env.now})
-                elif own_news["timestamp"] < news["timestamp"]:
-                    own_news.update(
-                        {"position": self.get_virtual_position(), "timestamp": self.env.now})
+        scope = self.env.gossip_scope
+        accepts = None if scope.scope == "all" else (lambda news: scope.accepts(self, news))
+        self.gossip.merge(in_msg.gossip, accepts=accepts)
+        scope.prune(self)
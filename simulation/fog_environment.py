@@ -1,19 +1,25 @@
 from simpy import Environment
+import numpy as np
 import math
-import uuid
-from random import Random
 import random
-from operator import itemgetter
 from .message import Message
 from .client import MobileClient
 from .node import FogNode
+from .registry import ParticipantRegistry
+from .message_log import MessageLog
+from .spatial_index import CelltowerIndex, NodeIndex
+from .latency import LatencyEngine, LatencyCache
+from .oracle import Oracle
+from .gossip import GossipScope
+from .pending_requests import PendingRequests
+from .mobility import MobilityStore
 import time
 
 
 class FogEnvironment(Environment):
     def __init__(self, config):
         """Child object of simpy.Environment, implements a FogEnvironment
-        Has list of clients, nodes and celltowers
+        Has a registry of clients, nodes and celltowers
         Runs a monitor process
 
         Args:
@@ -21,24 +27,106 @@ class FogEnvironment(Environment):
         """
         super().__init__()
         self.config = config
-        self.clients = []
-        self.nodes = []
-        self.celltowers = []
+        self.registry = ParticipantRegistry()
+        # Columnar log of all messages, message IDs are the rows of the log
+        self.message_log = MessageLog()
+        # Requests waiting for a response
+        self.pending_requests = PendingRequests(config["simulation"].get("request_timeout", 10))
+        # Seconds until unanswered Meridian pings and the last pings of silent senders are dropped
+        self.meridian_ping_timeout = config["simulation"].get("meridian_ping_timeout", self.pending_requests.timeout)
+        # Optimal connections of the client messages for the metrics
+        self.oracle = Oracle(self, config["simulation"].get("oracle", "eager"),
+                             sample_rate=config["simulation"].get("oracle_sample_rate", 1.0),
+                             seed=config["simulation"].get("oracle_seed", 0))
+        # Locality bound of the gossip of all participants
+        gossip_config = config.get("gossip", {})
+        self.gossip_scope = GossipScope(self, scope=gossip_config.get("scope", "all"),
+                                        radius=gossip_config.get("radius", 5000),
+                                        nearest=gossip_config.get("nearest", 16),
+                                        far_rate=gossip_config.get("far_rate", 0.05),
+                                        seed=gossip_config.get("seed", 0),
+                                        prune_interval=gossip_config.get("prune_interval", 10))
+        self.celltower_index = None
+        self.node_index = None
+        self.latency_engine = None
+        self.latency_cache = LatencyCache()
         self.boundaries = tuple()
-        self.messages = []
+        # Trajectories of all clients, positions are evaluated from the simulation time
+        self.mobility = MobilityStore(self)
+        # Callbacks of the periodic work, called every simulated second by the monitor process
+        self.tick_callbacks = []
+        # Connected clients of every node per simulated second, rows are ordered like the nodes
+        self.workload = None
+        self.workload_samples = 0
+        self.register_tick(self.oracle.flush)
+        self.register_tick(lambda: self.pending_requests.expire(self.now))
+        self.register_tick(self.sample_workload)
         self.monitor_process = self.process(self.monitor())
 
+    @property
+    def clients(self):
+        """List of all clients as {"id", "obj"} entries"""
+        return self.registry.clients
+
+    @property
+    def nodes(self):
+        """List of all fog nodes as {"id", "obj"} entries"""
+        return self.registry.nodes
+
+    @property
+    def celltowers(self):
+        """List of all cell towers as {"id", "obj"} entries"""
+        return self.registry.celltowers
+
+    def create_id(self, external_id):
+        """Creates the dense integer ID for a new participant
+        Participants are identified by this ID inside the simulation, the external ID is only used when metrics are exported
+
+        Args:
+            external_id (uuid|str): External ID of the participant, e.g. a UUID or the ID from the plans XML
+
+        Returns:
+            int: The integer ID of the participant
+        """
+        return self.registry.create_id(external_id)
+
+    def get_external_id(self, id_x):
+        """Maps the integer ID of a participant back to its external ID
+
+        Args:
+            id_x (int): ID of the participant
+
+        Returns:
+            uuid|str: External ID of the participant or None if the ID is unknown
+        """
+        return self.registry.get_external_id(id_x)
+
+    def add_participant(self, participant):
+        """Registers a client, fog node or cell tower in the environment
+
+        Args:
+            participant (FogNode|MobileClient|Celltower): The participant to be added
+        """
+        self.registry.add(participant)
+
     def get_participant(self, id_x):
         """
         Getter for all participants in the network
         Parameter ID as string
         Returns the participant object for the given ID
         """
-        entry = next(
-            (elem for elem in [*self.clients, *self.nodes] if elem["id"] == id_x), None)
-        if not entry:
-            return None
-        return entry.get("obj")
+        return self.registry.get(id_x)
+
+    def get_kind(self, id_x):
+        """Getter for the cached kind of a participant
+
+        Args:
+            id_x (uuid): ID of the participant
+
+        Returns:
+            str: Class name of the participant, e.g. "FogNode", or None if the ID is unknown
+        """
+        return self.registry.get_kind(id_x)
 
     def get_random_node(self):
         """
@@ -51,38 +139,85 @@ class FogEnvironment(Environment):
         Parameter send_id as string: ID of sender
         Paramater rec_id as string: ID of recipient
         Parameter msg as string: Message to be send
-        Parameter gossip as dict: Gossip of all virtual coordinates
+        Parameter gossip as tuple: Gossip entries of the sender for the recipient
         Parameter msg_type as int *optional: type of message -> 1: regular message (default), 2: Closest node request, 3: Node discovery
-        Parameter prev_msg as Message *optional: the predecessing Message
+        Parameter prev_msg as Message or int *optional: the predecessing Message or its ID
         """
-        # Create new message ID if none is given
-        msg_id = uuid.uuid4()
+        # Create new message ID
+        msg_id = self.message_log.next_id()
         # get the latency between the two participants
         # Assemble message
         message = Message(self, msg_id, send_id, rec_id, msg,
                           msg_type, gossip, response=response, prev_msg=prev_msg)
+        # Put message in the global message log
+        self.message_log.append(message)
+        if not response and prev_msg is None:
+            self.pending_requests.add(message)
         # Send message to receiver
-        delivery_process = self.process(self.message_delivery(message))
-        # Put message in gloabal history, gets cleared every timestep by the monitor process
-        self.messages.append(message)
+        self.schedule_delivery(message)
         # Return messsage to sender to put it into the history
         return message
 
-    def message_delivery(self, message):
-        """A delivery process for the message
-        Waits the latency of the message and then puts the message into the receicer's message pipe
+    def multicast_message(self, send_id, rec_ids, msg, gossips, response=False, msg_type=1, prev_msg=None):
+        """Sends the same message to many recipients at once
+        The latencies to all recipients are computed in one batch, the body is shared between the messages
+        Every recipient still receives a regular message with its own ID and latency
+
+        Args:
+            send_id (uuid): ID of sender
+            rec_ids (list): IDs of the recipients
+            msg (any): Message body, shared between all messages
+            gossips (list): Gossip of the sender for every recipient, ordered like rec_ids
+            response (bool, optional): Whether the messages are responses. Defaults to False.
+            msg_type (int, optional): Type of the messages. Defaults to 1.
+            prev_msg (Message|int, optional): The predecessing Message or its ID. Defaults to None.
+
+        Returns:
+            list: The sent messages in the order of rec_ids
+        """
+        if self.latency_engine is None:
+            self.build_latency_engine()
+        # Backhaul latencies to all nodes are calculated in one vectorized call
+        if self.get_kind(send_id) == "FogNode" and all(self.get_kind(rec_id) == "FogNode" for rec_id in rec_ids):
+            row = self.latency_engine.node_to_nodes(send_id)
+            node_index = self.latency_engine.node_index
+            latencies = [float(row[node_index[rec_id]]) for rec_id in rec_ids]
+        else:
+            latencies = [self.get_latency(send_id, rec_id) for rec_id in rec_ids]
+
+        messages = []
+        for rec_id, latency, gossip in zip(rec_ids, latencies, gossips):
+            message = Message(self, self.message_log.next_id(), send_id, rec_id, msg, msg_type, gossip,
+                              response=response, prev_msg=prev_msg, latency=latency)
+            self.message_log.append(message)
+            if not response and prev_msg is None:
+                self.pending_requests.add(message)
+            self.schedule_delivery(message)
+            messages.append(message)
+        return messages
+
+    def schedule_delivery(self, message):
+        """Schedules the delivery of the message
+        A single timeout event with the latency of the message is scheduled, no process is started per message
 
         Args:
             message (Message): Message to be delivered
+        """
+        delivery = self.timeout(message.latency, value=message)
+        delivery.callbacks.append(self.deliver_message)
 
-        Yields:
-            simpy.timeout: Delivery process waits the given latency of the message
+    def deliver_message(self, event):
+        """Callback of the delivery timeout, puts the message into the receiver's message pipe
+
+        Args:
+            event (simpy.Timeout): The expired delivery timeout with the message as value
         """
-        yield self.timeout(message.latency)
+        message = event.value
         self.get_participant(message.rec_id).msg_pipe.put(message)
 
     def get_latency(self, send_id, rec_id):
         """Calculates the latency between two participants in the network
+        The calculation itself is done by the LatencyEngine, see simulation/latency.py for the formula
 
         Args:
             send_id (uuid): ID of sender
@@ -91,47 +226,89 @@ class FogEnvironment(Environment):
         Returns:
             float: Latency in seconds
         """
-        my_random = Random()
-        my_random.seed(str(self.now) + str(send_id) + str(rec_id))
-        sender = self.get_participant(send_id)
-        receiver = self.get_participant(rec_id)
-
-        # Latency calculation for multihop between client and node connection is the following:
-        # Latency = Sum ( Transmission delay + Propagation + Processing + Queuing )
-        # Transmission/Serialization delay = -0.008 * bandwidth Gbps + 0.088  (Gpbs is usually between 0.1 - 1 for end users)
-        # Propagation = distance km * 0.0035 ms/km
-        # Processing = [0.010, 0.030]ms + Network error (= constant 0.5ms) -> depending on Hardware
-        # Queing = 1 / (1 * bandwidth Gbps) with upper limit of 5ms
+        latency = self.latency_cache.get(self.now, send_id, rec_id)
+        if latency is not None:
+            return latency
+        if self.latency_engine is None:
+            self.build_latency_engine()
+        send_kind = self.get_kind(send_id)
+        rec_kind = self.get_kind(rec_id)
 
         # Connection between 2 nodes the less good bandwidth is used
-        if isinstance(sender, FogNode) and isinstance(receiver, FogNode):
-
-            bandwidth = min(sender.get_bandwidth(),
-                            receiver.get_bandwidth())
-            transmission_delay = -0.008 * bandwidth + 0.088
-            # basically no distance as we are connected via backhaul
-            distance = self.get_distance(sender.phy_x, sender.phy_y, receiver.phy_x, receiver.phy_y)/1000
-            propagation_delay = distance * 0.0035
-            processing_delay = sender.hardware * 0.01 + 0.05
-            queuing_delay = min(50, 1/(2 * bandwidth))
-            # print(transmission_delay + propagation_delay + processing_delay + queuing_delay, distance)
+        if send_kind == "FogNode" and rec_kind == "FogNode":
+            latency = self.latency_engine.node_node_latency(send_id, rec_id)
         # Connection between client and node
         else:
             # Checking which participant is Node and who is Client
-            client = sender if isinstance(
-                sender, MobileClient) else receiver
-            node = sender if isinstance(sender, FogNode) else receiver
+            client_id, node_id = (send_id, rec_id) if send_kind == "MobileClient" else (rec_id, send_id)
+            # Calculating the physical distance from the client to the cell tower, the node's distance is stored in the engine
+            celltower_id_cl, distance_cl = self.get_nearest_celltower(
+                self.get_participant(client_id))
+            latency = self.latency_engine.client_node_latency(distance_cl, node_id)
+        self.latency_cache.put(self.now, send_id, rec_id, latency)
+        return latency
 
-            # Calculating the physical distance from each participant to the cell tower
-            celltower_id_cl, distance_cl = self.get_nearest_celltower(client)
-            celltower_id_n, distance_n = self.get_nearest_celltower(node)
-            distance = distance_cl + distance_n
-            transmission_delay = -0.008 * node.get_bandwidth() + 0.088
-            propagation_delay = distance/1000 * 0.0035
-            processing_delay = node.hardware * 0.01 + 0.05
-            queuing_delay = min(50, 1/(2 * node.get_bandwidth()))
+    def get_latencies(self, client_id):
+        """Calculates the latency from one client to every Fog Node in a single vectorized call
 
-        return (transmission_delay + propagation_delay + processing_delay + queuing_delay)/1000
+        Args:
+            client_id (uuid): ID of the client
+
+        Returns:
+            ndarray: Latencies in seconds, ordered like env.nodes
+        """
+        if self.latency_engine is None:
+            self.build_latency_engine()
+        celltower_id, distance = self.get_nearest_celltower(
+            self.get_participant(client_id))
+        return self.latency_engine.client_to_nodes(distance)
+
+    def get_latency_matrix(self, client_ids):
+        """Calculates the latency from many clients to every Fog Node in a single vectorized call
+
+        Args:
+            client_ids (list): IDs of the clients
+
+        Returns:
+            ndarray: Latency matrix in seconds of shape (clients, nodes), columns ordered like env.nodes
+        """
+        if self.latency_engine is None:
+            self.build_latency_engine()
+        celltower_ids, distances = self.get_nearest_celltowers(
+            *self.get_client_coordinates(client_ids))
+        return self.latency_engine.clients_to_nodes(distances)
+
+    def get_client_coordinates(self, client_ids):
+        """Evaluates the positions of many clients in a single vectorized pass of the mobility store
+
+        Args:
+            client_ids (list): IDs of the clients
+
+        Returns:
+            ndarray: x coordinates of the clients
+            ndarray: y coordinates of the clients
+        """
+        return self.mobility.get_positions([self.get_participant(client_id).mobility_index
+                                            for client_id in client_ids], self.now)
+
+    def build_latency_engine(self):
+        """Builds the vectorized latency engine over all Fog Nodes
+        Has to be called after the Fog Nodes are placed
+        """
+        self.latency_engine = LatencyEngine(self)
+
+    def update_node_load(self, node):
+        """Has to be called whenever the clients of a Fog Node change, keeps the bandwidth in the latency engine up to date
+        Cached latencies are dropped as they depend on the bandwidth
+
+        Args:
+            node (FogNode): The Fog Node with changed clients
+        """
+        # Deferred optima depend on the load before the change
+        self.oracle.load_changed()
+        if self.latency_engine is not None:
+            self.latency_engine.update_node(node)
+        self.latency_cache.invalidate()
 
     def get_distance(self, send_x, send_y, rec_x, rec_y):
         """Calculates the physical distance between to points in meters
@@ -148,17 +325,17 @@ class FogEnvironment(Environment):
         distance = math.sqrt((rec_x - send_x)**2 + (rec_y - send_y)**2)
         return distance
 
-    def get_message(self, msg_id):
-        """Gets the message object of a given message ID
-        Info: Message List currently gets emptied every simulated second by the monitor process
+    def receive_message(self, message):
+        """Marks a message as processed by its recipient in the message log
+        Resolves the pending request of a response and stores the round-trip-time in the response
+        Has to be called by the participants when they take a message out of their pipe
 
         Args:
-            msg_id (uuid): Id of the message
-
-        Returns:
-            Message: The message with the given ID or None if no message is found
+            message (Message): The received message
         """
-        return next((message for message in self.messages if message.id == msg_id), None)
+        self.message_log.receive(message, self.now)
+        if message.response and message.prev_msg_id is not None:
+            message.rtt = self.pending_requests.resolve(message.prev_msg_id, self.now)
 
     def generate_boundaries(self, x_trans, y_trans, method="center"):
         """Calculates the boundaries of the simulation based on the map boundaries and the size of the area
@@ -201,18 +378,18 @@ class FogEnvironment(Environment):
         Returns:
             [List]: The first n elements of a sorted List of nearby nodes by physical distance
         """
-        neighbours = []
-        for node in self.nodes:
-            # skip the requesting node
-            if(node["id"] == req_node.id):
-                continue
-            a_x, a_y = req_node.get_coordinates()
-            b_x, b_y = node["obj"].get_coordinates()
-            dist = self.get_distance(a_x, a_y, b_x, b_y)
-            neighbours.append({"id": node["id"], "distance": dist})
-        # Sort list by distance ascending
-        sorted_neighbours = sorted(neighbours, key=itemgetter('distance'))
-        return sorted_neighbours[:4]
+        if self.node_index is None:
+            self.build_node_index(n)
+        return self.node_index.neighbours(req_node.id, n)
+
+    def build_node_index(self, k=4):
+        """Builds the static spatial index over all Fog Nodes and computes the k nearest neighbours of every node in bulk
+        Has to be called after the Fog Nodes are placed
+
+        Args:
+            k (int, optional): Amount of neighbours per node. Defaults to 4 as proposed by Dabek et. al.
+        """
+        self.node_index = NodeIndex(self.nodes, k)
 
     def get_closest_node(self, client_id):
         """Gets the closest node to the client based on the latency between client and Node
@@ -224,44 +401,87 @@ class FogEnvironment(Environment):
         Returns:
             UUID: UUID of the node
         """
-
-        latencies = []
-        for node in self.nodes:
-            if(len(node["obj"].clients) < node["obj"].slots):
-                lat = self.get_latency(client_id, node["obj"].id)
-                latencies.append(
-                    {"id": node["id"], "lat": lat, 'slots': node["obj"].slots, 'clients': len(node["obj"].clients)})
-
-        # Primary sort by latency, secondary sort by ID
-        latencies = sorted(latencies, key=itemgetter('id'))
-        sorted_lat = sorted(latencies, key=itemgetter('lat'))
-        # When there is no node with an open slot we return None
+        if self.latency_engine is None:
+            self.build_latency_engine()
+        # Primary criterion is the latency, secondary the ID
+        # When there is no node with an open slot None is returned
         # This only happens when there are more clients than slots in the whole scenario
-        if not sorted_lat:
-            return None
+        celltower_id, distance = self.get_nearest_celltower(
+            self.get_participant(client_id))
+        return self.latency_engine.closest_node(distance)
+
+    def get_closest_nodes(self, client_ids):
+        """Batched version of get_closest_node, answers the baseline for many clients at once
+
+        Args:
+            client_ids (list): UUIDs of the clients
 
-        closest_node = sorted_lat.pop(0)
-        return closest_node.get("id")
+        Returns:
+            list: UUIDs of the closest nodes, None for a client if no node has an open slot
+        """
+        if self.latency_engine is None:
+            self.build_latency_engine()
+        celltower_ids, distances = self.get_nearest_celltowers(
+            *self.get_client_coordinates(client_ids))
+        return self.latency_engine.closest_nodes(distances)
 
     def monitor(self):
         """Monitor process
         Prints the current progress of the simulation every simulated second
-        Clears the message List every second to save memory
+        Runs all registered periodic work every second in a single pass
 
         """
         runtime = self.config["simulation"]["runtime"]
         modulus = runtime / 10
         timestamp = 0
+        logged_messages = 0
         while(True):
             duration = round(time.perf_counter() - timestamp, 2)
             timestamp = time.perf_counter()
             print("Runtime: {}/{} in {} seconds with {} messages".format(self.now,
-                                                                         runtime, duration, len(self.messages)))
-
-            # clear message history
-            self.messages = []
+                                                                         runtime, duration, len(self.message_log) - logged_messages))
+            logged_messages = len(self.message_log)
+            for callback in self.tick_callbacks:
+                callback()
             yield self.timeout(1)
 
+    def register_tick(self, callback):
+        """Registers periodic work, which is run every simulated second by the monitor process
+        Replaces a process per participant that wakes up every second
+
+        Args:
+            callback (function): Function without arguments, called in the order of registration
+        """
+        self.tick_callbacks.append(callback)
+
+    def sample_workload(self):
+        """Records the amount of connected clients of every Fog Node for the current second
+        The clients are taken from the latency engine in a single copy, the matrix is preallocated for the runtime and grows if the simulation runs longer
+        """
+        if not self.nodes:
+            return
+        if self.latency_engine is None:
+            self.build_latency_engine()
+        if self.workload is None:
+            self.workload = np.zeros((len(self.nodes), int(math.ceil(self.config["simulation"]["runtime"])) + 1),
+                                     dtype=np.int32)
+        second = int(math.ceil(self.now))
+        if second >= self.workload.shape[1]:
+            self.workload = np.concatenate(
+                (self.workload, np.zeros_like(self.workload)), axis=1)
+        self.workload[:, second] = self.latency_engine.clients
+        self.workload_samples = second + 1
+
+    def build_celltower_index(self):
+        """Builds the static spatial index over all cell towers
+        Has to be called after the cell towers and Fog Nodes are placed
+        As Fog Nodes never move, their nearest cell tower is calculated once and stored in the node
+        """
+        self.celltower_index = CelltowerIndex(self.celltowers)
+        for node in self.nodes:
+            node["obj"].nearest_celltower = self.celltower_index.nearest(
+                *node["obj"].get_coordinates())
+
     def get_nearest_celltower(self, participant):
         """Searches the geographically closest cell tower for a given participant
 
@@ -272,13 +492,24 @@ class FogEnvironment(Environment):
             uuid: ID of the cell tower
             float: Distance between the cell tower and the participant
         """
-        celltowers = []
-        for celltower in self.celltowers:
-            a_x, a_y = participant.get_coordinates()
-            b_x, b_y = celltower["obj"].get_coordinates()
-            dist = self.get_distance(a_x, a_y, b_x, b_y)
-            celltowers.append({"id": celltower.get('id'), "distance": dist})
-        # Sort list by distance ascending
-        sorted_celltowers = sorted(celltowers, key=itemgetter('distance'))
-        nearest_celltower = sorted_celltowers.pop(0)
-        return nearest_celltower.get('id'), nearest_celltower.get('distance')
+        if self.celltower_index is None:
+            self.build_celltower_index()
+        if self.get_kind(participant.id) == "FogNode" and participant.nearest_celltower:
+            return participant.nearest_celltower
+        return self.celltower_index.nearest(*participant.get_coordinates())
+
+    def get_nearest_celltowers(self, xs, ys):
+        """Searches the geographically closest cell towers for many points at once
+
+        Args:
+            xs (array-like): x coordinates in GK4/EPSG:31468
+            ys (array-like): y coordinates in GK4/EPSG:31468
+
+        Returns:
+            list: IDs of the cell towers
+            ndarray: Distances between the points and the cell towers
+        """
+        if self.celltower_index is None:
+            self.build_celltower_index()
+        idx, distances = self.celltower_index.nearest_many(xs, ys)
+        return [self.celltower_index.ids[i] for i in idx], distances
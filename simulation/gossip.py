@@ -0,0 +1,262 @@
+import math
+import time
+from collections import OrderedDict
+
+
+class GossipTable(object):
+    def __init__(self, owner_id, own_news):
+        """Versioned gossip of a participant, indexed by participant ID
+        Every entry carries a version, which only the participant the entry is about increments, and the timestamp of its last change
+        Every local change gets a sequence number, so the entries changed since the last exchange with a peer are found without scanning the table
+        Entries are immutable dicts, they are replaced on change and shared with messages and other participants
+
+        Args:
+            owner_id (int): ID of the participant owning the table
+            own_news (dict): Initial news about the owner, e.g. {"id", "position", "timestamp", "type"}
+        """
+        self.owner_id = owner_id
+        # Participant ID -> news
+        self.entries = {}
+        # Participant ID -> local sequence number of the last change, ordered by sequence number
+        self.sequence = OrderedDict()
+        self.counter = 0
+        # Peer ID -> highest local sequence number already sent to the peer
+        self.high_water_marks = {}
+        # Statistics for the metrics
+        self.max_size = 0
+        self.merges = 0
+        self.merge_time = 0
+        self.store({**own_news, "id": owner_id, "version": 1})
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def get(self, id_x):
+        """Returns the news about a participant
+
+        Args:
+            id_x (int): ID of the participant
+
+        Returns:
+            dict: The news or None if the participant is unknown
+        """
+        return self.entries.get(id_x)
+
+    def get_own(self):
+        """Returns the news about the owner of the table
+
+        Returns:
+            dict: The news about the owner
+        """
+        return self.entries[self.owner_id]
+
+    def store(self, news):
+        """Stores an entry and marks it as changed
+
+        Args:
+            news (dict): The news to be stored
+        """
+        self.counter += 1
+        self.entries[news["id"]] = news
+        self.sequence[news["id"]] = self.counter
+        self.sequence.move_to_end(news["id"])
+        self.max_size = max(self.max_size, len(self.entries))
+
+    def remove(self, id_x):
+        """Removes the news about a participant, the news about the owner is never removed
+
+        Args:
+            id_x (int): ID of the participant
+        """
+        if id_x != self.owner_id and id_x in self.entries:
+            del self.entries[id_x]
+            del self.sequence[id_x]
+
+    def update_own(self, timestamp, **fields):
+        """Updates the news about the owner, a new version is only created if a field changed
+
+        Args:
+            timestamp (float): Current simulation time
+            **fields: The fields of the news to be updated, e.g. position or available_slots
+
+        Returns:
+            boolean: Whether the news changed
+        """
+        own_news = self.get_own()
+        if all(own_news.get(key) == value for key, value in fields.items()):
+            return False
+        self.store({**own_news, **fields, "timestamp": timestamp,
+                    "version": own_news["version"] + 1})
+        return True
+
+    def merge(self, gossip, accepts=None):
+        """Merges the gossip of an incoming message, only newer versions replace the own entries
+        The news about the owner is never taken from other participants
+
+        Args:
+            gossip (tuple): Entries of the incoming message
+            accepts (function, optional): Predicate whether unknown news are taken into the table, all are taken if None. Defaults to None.
+
+        Returns:
+            list: The entries which were added or replaced
+        """
+        start = time.perf_counter()
+        changed = []
+        for news in gossip:
+            if news["id"] == self.owner_id:
+                continue
+            own_news = self.entries.get(news["id"])
+            if own_news is None:
+                if accepts is not None and not accepts(news):
+                    continue
+            elif own_news["version"] >= news["version"]:
+                continue
+            self.store(news)
+            changed.append(news)
+        self.merges += 1
+        self.merge_time += time.perf_counter() - start
+        return changed
+
+    def delta(self, peer_id):
+        """Returns the entries changed since the last exchange with a peer and advances the peer's high-water mark
+        The news about the owner is always part of the delta, the recipient relies on it to identify the sender
+
+        Args:
+            peer_id (int): ID of the recipient
+
+        Returns:
+            tuple: The changed entries
+        """
+        high_water_mark = self.high_water_marks.get(peer_id, 0)
+        delta = []
+        for id_x in reversed(self.sequence):
+            if self.sequence[id_x] <= high_water_mark:
+                break
+            if id_x != self.owner_id:
+                delta.append(self.entries[id_x])
+        delta.append(self.get_own())
+        self.high_water_marks[peer_id] = self.counter
+        return tuple(delta)
+
+
+class GossipScope(object):
+    SCOPES = ("all", "radius", "nearest")
+
+    def __init__(self, env, scope="all", radius=5000, nearest=16, far_rate=0.05, seed=0, prune_interval=10):
+        """Locality bound of the gossip of all participants
+        all: every participant keeps the news of every other participant
+        radius: news about participants within the physical radius are kept
+        nearest: news about the k nearest participants are kept, ranked by the Vivaldi estimate if the owner has a Vivaldi position, else by the physical distance
+        In addition to the local news a sample of the far participants is kept, so the gossip still spreads over the whole area
+        The sample is drawn per pair of participants from a hash, so it is reproducible and stable over time
+
+        Args:
+            env (FogEnvironment): Fog Environment of the simulation
+            scope (str, optional): Either all, radius or nearest. Defaults to "all".
+            radius (float, optional): Radius in meters for the radius scope. Defaults to 5000.
+            nearest (int, optional): Amount of participants for the nearest scope. Defaults to 16.
+            far_rate (float, optional): Share of the far participants kept, between [0, 1]. Defaults to 0.05.
+            seed (int, optional): Seed of the far sample. Defaults to 0.
+            prune_interval (float, optional): Seconds between two prunings of a gossip table. Defaults to 10.
+
+        Raises:
+            ValueError: If the scope is unknown
+        """
+        if scope not in self.SCOPES:
+            raise ValueError(
+                "Unknown gossip scope. Expected one of {}, found {}".format(list(self.SCOPES), scope))
+        self.env = env
+        self.scope = scope
+        self.radius = radius
+        self.nearest = nearest
+        self.far_rate = far_rate
+        self.seed = seed
+        self.prune_interval = prune_interval
+        # Owner ID -> time of the last pruning
+        self.last_pruned = {}
+        # Owner ID -> rank of the farthest news kept at the last pruning, only for the nearest scope
+        self.bounds = {}
+
+    def is_far_sampled(self, owner_id, id_x):
+        """Whether the news about a far participant is part of the owner's sample
+
+        Args:
+            owner_id (int): ID of the owner of the gossip table
+            id_x (int): ID of the far participant
+
+        Returns:
+            boolean: Whether the news is kept
+        """
+        # Multiplicative hash of the pair, uniform enough for sampling and identical in every run
+        pair_hash = (owner_id * 2654435761 + id_x * 40503 + self.seed * 97) % 4294967296
+        return pair_hash < self.far_rate * 4294967296
+
+    def get_distance(self, owner, news):
+        """Physical distance between the owner and the participant of the news
+
+        Args:
+            owner (FogNode|MobileClient): Owner of the gossip table
+            news (dict): News about a participant
+
+        Returns:
+            float: Distance in meters
+        """
+        owner_x, owner_y = owner.get_coordinates()
+        x, y = self.env.get_participant(news["id"]).get_coordinates()
+        return math.sqrt((owner_x - x)**2 + (owner_y - y)**2)
+
+    def get_rank(self, owner, news):
+        """Rank of a news for the owner, the lower the closer
+        The radius scope and owners without a Vivaldi position rank by physical distance, otherwise by the Vivaldi estimate
+
+        Args:
+            owner (FogNode|MobileClient): Owner of the gossip table
+            news (dict): News about a participant
+
+        Returns:
+            float: Distance in meters or estimated rtt
+        """
+        own_position = owner.get_virtual_position()
+        if self.scope == "nearest" and hasattr(own_position, "estimateRTT"):
+            return own_position.estimateRTT(news["position"])
+        return self.get_distance(owner, news)
+
+    def accepts(self, owner, news):
+        """Whether unknown news are taken into the owner's gossip
+        The nearest scope takes news closer than the farthest news kept at the owner's last pruning
+
+        Args:
+            owner (FogNode|MobileClient): Owner of the gossip table
+            news (dict): Incoming news
+
+        Returns:
+            boolean: Whether the news is taken
+        """
+        if self.scope == "all" or self.is_far_sampled(owner.id, news["id"]):
+            return True
+        bound = self.radius if self.scope == "radius" else self.bounds.get(owner.id, math.inf)
+        return self.get_rank(owner, news) <= bound
+
+    def prune(self, owner):
+        """Removes the news which are out of scope from the owner's gossip
+        Only prunes if the last pruning of the owner is at least prune_interval seconds ago
+
+        Args:
+            owner (FogNode|MobileClient): Owner of the gossip table
+        """
+        if self.scope == "all" or self.env.now - self.last_pruned.get(owner.id, 0) < self.prune_interval:
+            return
+        self.last_pruned[owner.id] = self.env.now
+        ranked = sorted(((self.get_rank(owner, news), news["id"]) for news in owner.gossip
+                         if news["id"] != owner.id and not self.is_far_sampled(owner.id, news["id"])))
+        if self.scope == "radius":
+            # Clients move, so news taken in earlier may be out of the radius by now
+            far = [id_x for rank, id_x in ranked if rank > self.radius]
+        else:
+            far = [id_x for rank, id_x in ranked[self.nearest:]]
+            self.bounds[owner.id] = ranked[self.nearest - 1][0] if len(ranked) >= self.nearest else math.inf
+        for id_x in far:
+            owner.gossip.remove(id_x)
@@ -0,0 +1,248 @@
+import numpy as np
+
+
+class LatencyEngine(object):
+    def __init__(self, env):
+        """Vectorized latency calculation between clients and Fog Nodes
+        Keeps the coordinates, hardware, distance to the nearest cell tower and current bandwidth of all Fog Nodes in NumPy arrays
+        Has to be built after the Fog Nodes are placed and the cell tower index is built
+
+        Latency calculation for multihop between client and node connection is the following:
+        Latency = Sum ( Transmission delay + Propagation + Processing + Queuing )
+        Transmission/Serialization delay = -0.008 * bandwidth Gbps + 0.088  (Gpbs is usually between 0.1 - 1 for end users)
+        Propagation = distance km * 0.0035 ms/km
+        Processing = [0.010, 0.030]ms + Network error (= constant 0.5ms) -> depending on Hardware
+        Queing = 1 / (1 * bandwidth Gbps) with upper limit of 5ms
+
+        Args:
+            env (FogEnvironment): Fog Environment of the simulation
+        """
+        self.env = env
+        nodes = [node["obj"] for node in env.nodes]
+        self.node_ids = [node.id for node in nodes]
+        # Node ID -> position in the arrays
+        self.node_index = {node_id: idx for idx,
+                           node_id in enumerate(self.node_ids)}
+        # Rank of every node when sorted by ID, used to break ties in the oracle
+        self.id_rank = np.empty(len(nodes), dtype=np.int64)
+        self.id_rank[sorted(range(len(nodes)), key=lambda idx: self.node_ids[idx])] = np.arange(len(nodes))
+        self.x = np.array([node.phy_x for node in nodes], dtype=np.float64)
+        self.y = np.array([node.phy_y for node in nodes], dtype=np.float64)
+        self.hardware = np.array(
+            [node.hardware for node in nodes], dtype=np.float64)
+        self.celltower_distance = np.array(
+            [env.get_nearest_celltower(node)[1] for node in nodes], dtype=np.float64)
+        self.slots = np.array([node.slots for node in nodes], dtype=np.float64)
+        self.clients = np.array([len(node.clients)
+                                 for node in nodes], dtype=np.float64)
+        self.bandwidth = np.array([node.get_bandwidth()
+                                   for node in nodes], dtype=np.float64)
+        # Fog Nodes never move, so the propagation delay over the backhaul is only calculated once
+        # Propagation = distance km * 0.0035 ms/km, stored as dense float32 matrix indexed by node position
+        distance = np.sqrt((self.x[:, np.newaxis] - self.x)**2 +
+                           (self.y[:, np.newaxis] - self.y)**2)/1000
+        self.node_propagation = (distance * 0.0035).astype(np.float32)
+
+    def update_node(self, node):
+        """Updates the client count and bandwidth of a Fog Node after its clients have changed
+
+        Args:
+            node (FogNode): The Fog Node with changed clients
+        """
+        idx = self.node_index[node.id]
+        self.clients[idx] = len(node.clients)
+        self.bandwidth[idx] = node.get_bandwidth()
+
+    def client_node_latency(self, client_distance, node_id):
+        """Latency between a single client and a single Fog Node
+
+        Args:
+            client_distance (float): Distance between the client and its nearest cell tower in meters
+            node_id (uuid): ID of the Fog Node
+
+        Returns:
+            float: Latency in seconds
+        """
+        idx = self.node_index[node_id]
+        bandwidth = float(self.bandwidth[idx])
+        distance = client_distance + float(self.celltower_distance[idx])
+        transmission_delay = -0.008 * bandwidth + 0.088
+        propagation_delay = distance/1000 * 0.0035
+        processing_delay = float(self.hardware[idx]) * 0.01 + 0.05
+        queuing_delay = min(50, 1/(2 * bandwidth))
+        return (transmission_delay + propagation_delay + processing_delay + queuing_delay)/1000
+
+    def node_node_latency(self, send_id, rec_id):
+        """Latency between two Fog Nodes, the connection uses the lower bandwidth of both
+
+        Args:
+            send_id (uuid): ID of the sending Fog Node
+            rec_id (uuid): ID of the receiving Fog Node
+
+        Returns:
+            float: Latency in seconds
+        """
+        send_idx = self.node_index[send_id]
+        rec_idx = self.node_index[rec_id]
+        # Bandwidth is the only term changing over time
+        bandwidth = float(
+            min(self.bandwidth[send_idx], self.bandwidth[rec_idx]))
+        transmission_delay = -0.008 * bandwidth + 0.088
+        propagation_delay = float(self.node_propagation[send_idx, rec_idx])
+        processing_delay = float(self.hardware[send_idx]) * 0.01 + 0.05
+        queuing_delay = min(50, 1/(2 * bandwidth))
+        return (transmission_delay + propagation_delay + processing_delay + queuing_delay)/1000
+
+    def node_to_nodes(self, send_id):
+        """Latencies from one Fog Node to every Fog Node in a single vectorized call
+
+        Args:
+            send_id (uuid): ID of the sending Fog Node
+
+        Returns:
+            ndarray: Latencies in seconds, ordered like self.node_ids
+        """
+        send_idx = self.node_index[send_id]
+        bandwidth = np.minimum(self.bandwidth[send_idx], self.bandwidth)
+        transmission_delay = -0.008 * bandwidth + 0.088
+        propagation_delay = self.node_propagation[send_idx].astype(np.float64)
+        processing_delay = self.hardware[send_idx] * 0.01 + 0.05
+        queuing_delay = np.minimum(50, 1/(2 * bandwidth))
+        return (transmission_delay + propagation_delay + processing_delay + queuing_delay)/1000
+
+    def client_to_nodes(self, client_distance):
+        """Latencies from one client to every Fog Node in a single vectorized call
+
+        Args:
+            client_distance (float): Distance between the client and its nearest cell tower in meters
+
+        Returns:
+            ndarray: Latencies in seconds, ordered like self.node_ids
+        """
+        return self.clients_to_nodes(np.array([client_distance], dtype=np.float64))[0]
+
+    def clients_to_nodes(self, client_distances, bandwidth=None):
+        """Latencies from many clients to every Fog Node in a single vectorized call
+
+        Args:
+            client_distances (array-like): Distances between the clients and their nearest cell towers in meters
+            bandwidth (ndarray, optional): Bandwidth of every node, the current bandwidth if None. Defaults to None.
+
+        Returns:
+            ndarray: Latency matrix in seconds of shape (clients, nodes)
+        """
+        if bandwidth is None:
+            bandwidth = self.bandwidth
+        client_distances = np.asarray(client_distances, dtype=np.float64)
+        distance = client_distances[:, np.newaxis] + self.celltower_distance
+        transmission_delay = -0.008 * bandwidth + 0.088
+        propagation_delay = distance/1000 * 0.0035
+        processing_delay = self.hardware * 0.01 + 0.05
+        queuing_delay = np.minimum(50, 1/(2 * bandwidth))
+        return (transmission_delay + propagation_delay + processing_delay + queuing_delay)/1000
+
+    def closest_node(self, client_distance):
+        """Baseline oracle: the node with an open slot and the lowest latency to a single client
+        Ties are broken by the lower node ID
+
+        Args:
+            client_distance (float): Distance between the client and its nearest cell tower in meters
+
+        Returns:
+            uuid: ID of the closest node or None if no node has an open slot
+        """
+        return self.closest_nodes(np.array([client_distance], dtype=np.float64))[0]
+
+    def closest_nodes(self, client_distances):
+        """Baseline oracle for many clients at once in a single vectorized pass
+
+        Args:
+            client_distances (array-like): Distances between the clients and their nearest cell towers in meters
+
+        Returns:
+            list: IDs of the closest nodes, None for clients if no node has an open slot
+        """
+        return self.pick_closest(self.clients_to_nodes(client_distances))
+
+    def pick_closest(self, latencies, clients=None):
+        """Baseline oracle on an already calculated latency matrix
+
+        Args:
+            latencies (ndarray): Latency matrix in seconds of shape (clients, nodes)
+            clients (ndarray, optional): Connected clients of every node, the current clients if None. Defaults to None.
+
+        Returns:
+            list: IDs of the closest nodes, None for clients if no node has an open slot
+        """
+        if clients is None:
+            clients = self.clients
+        # Nodes without open slots are never chosen
+        latencies = np.where(clients >= self.slots, np.inf, latencies)
+        min_latencies = latencies.min(axis=1)
+        # Among all nodes with the minimal latency take the one with the lowest ID
+        ranks = np.where(latencies == min_latencies[:, np.newaxis], self.id_rank, len(self.node_ids))
+        closest = ranks.argmin(axis=1)
+        return [self.node_ids[idx] if np.isfinite(min_latency) else None
+                for idx, min_latency in zip(closest, min_latencies)]
+
+
+class LatencyCache(object):
+    def __init__(self):
+        """Memoization of latencies between two participants for the current simulated instant
+        The cache is only valid for a single env.now and has to be invalidated whenever a node's bandwidth changes
+        Client positions only change with the clock, as they are interpolated from the simulation time
+        Counts hits and misses to evaluate the hit rate of a workload
+        """
+        self.entries = {}
+        self.timestamp = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, now, send_id, rec_id):
+        """Returns the cached latency between two participants
+
+        Args:
+            now (float): Current simulation time
+            send_id (uuid): ID of the sender
+            rec_id (uuid): ID of the recipient
+
+        Returns:
+            float: Cached latency in seconds or None if there is no valid entry
+        """
+        # The clock advanced, so every entry is outdated
+        if now != self.timestamp:
+            self.entries.clear()
+            self.timestamp = now
+        latency = self.entries.get((send_id, rec_id))
+        if latency is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return latency
+
+    def put(self, now, send_id, rec_id, latency):
+        """Stores the latency between two participants for the current simulation time
+
+        Args:
+            now (float): Current simulation time
+            send_id (uuid): ID of the sender
+            rec_id (uuid): ID of the recipient
+            latency (float): Latency in seconds
+        """
+        if now != self.timestamp:
+            self.entries.clear()
+            self.timestamp = now
+        self.entries[(send_id, rec_id)] = latency
+
+    def invalidate(self):
+        """Drops all entries of the cache"""
+        self.entries.clear()
+
+    def hit_rate(self):
+        """Share of cache lookups which were answered from the cache
+
+        Returns:
+            float: Hit rate between [0, 1], 0 if there was no lookup yet
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
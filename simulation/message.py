@@ -1,68 +1,92 @@
 import time
-from .node import FogNode
 
 class Message(object):
-    def __init__(self, env, msg_id, send_id, rec_id, body, msg_type, gossip, response = False, prev_msg=None):
-        """AI is creating summary for __init__
+    # Messages are created for every single communication, slots keep them small
+    __slots__ = ("id", "send_id", "rec_id", "timestamp", "body", "msg_type", "latency", "gossip", "response",
+                 "prev_msg_id", "opt_node", "opt_latency", "discovered_latency", "rec_timestamp", "rtt")
+
+    def __init__(self, env, msg_id, send_id, rec_id, body, msg_type, gossip, response = False, prev_msg=None, latency=None):
+        """Message between two participants of the simulation
+        Only the ID of the previous message is kept, so request/response chains are not kept alive by their last message
+        The gossip holds the immutable entries the sender shares with the recipient
 
         Args:
-            env (FogEnvironment): Fog Environment of the simulation
-            msg_id (uuid): Message ID
-            send_id (uuid): ID of the sender
-            rec_id (uuid): ID of the recipient
+            env (FogEnvironment): Fog Environment of the simulation, only used during construction
+            msg_id (int): Message ID
+            send_id (int): ID of the sender
+            rec_id (int): ID of the recipient
             body (any): Message body
             msg_type (int): Message type, either 1, 2, 3 or 4
-            gossip (dict): Dictionary of news
+            gossip (tuple): Gossip entries shared with the recipient
             response (bool, optional): Whether the message is a response. Defaults to False.
-            prev_msg (Message, optional): The previous message this responds to or None. Defaults to None.
+            prev_msg (Message|int, optional): The previous message this responds to, its ID or None. Defaults to None.
+            latency (float, optional): Precomputed latency of the message, calculated by the environment if None. Defaults to None.
         """
-        self.env = env
         self.id = msg_id
         self.send_id = send_id
         self.rec_id = rec_id
         self.timestamp = env.now
         self.body = body
         self.msg_type = msg_type
-        self.latency = self.env.get_latency(send_id, rec_id)
-        self.gossip = gossip
+        self.latency = latency if latency is not None else env.get_latency(send_id, rec_id)
+        # Gossip entries are never changed in place, so a shallow copy is a snapshot
+        self.gossip = tuple(gossip)
         self.response = response
-        self.prev_msg = prev_msg
-        self.opt_node, self.opt_latency = self.calc_optimals()
-        if(msg_type == 2 and response):
-            self.discovered_latency = self.env.get_latency(body, self.rec_id)
-        
+        self.prev_msg_id = prev_msg.id if isinstance(prev_msg, Message) else prev_msg
+        self.opt_node, self.opt_latency = self.calc_optimals(env, prev_msg)
+        self.discovered_latency = None
+        self.rec_timestamp = None
+        # Round-trip-time of the request, set when a response is received
+        self.rtt = None
+        # The node answers None if it does not know a node with free slots
+        if(msg_type == 2 and response and body is not None):
+            self.discovered_latency = env.get_latency(body, self.rec_id)
 
-    def calc_optimals(self):
+    def calc_optimals(self, env, prev_msg=None):
         """Calculates the theoretically optimal connection of this message
         This calculation is not used in the simulation directly but by the metric collector to identify the message errors
         Optimals are not calculated for messages from type 3 or messages between nodes
+        Depending on the oracle mode of the environment the calculation is skipped or deferred to the oracle
+
+        Args:
+            env (FogEnvironment): Fog Environment of the simulation
+            prev_msg (Message|int, optional): The previous message, or its ID. Defaults to None.
 
         Returns:
-            uuid: ID of the optimal node or None
+            int: ID of the optimal node or None
             float: Latency to the optimal node or None
         """
-        if (isinstance(self.env.get_participant(self.send_id), FogNode) and isinstance(self.env.get_participant(self.rec_id), FogNode)):
+        if (env.get_kind(self.send_id) == "FogNode" and env.get_kind(self.rec_id) == "FogNode"):
             return None, None
         elif(self.msg_type == 3):
             return None, None
+        elif(env.oracle.mode == "off"):
+            return None, None
+        elif(not self.response and not env.oracle.is_sampled(self)):
+            return None, None
+        elif(env.oracle.mode == "deferred"):
+            env.oracle.defer(self)
+            return None, None
         elif(self.response):
-            prev_msg = self.prev_msg
-            prev_opt_node = prev_msg.opt_node
-            if prev_opt_node:
-                opt_latency = self.env.get_latency(prev_opt_node, self.rec_id)
+            if isinstance(prev_msg, Message):
+                prev_opt_node = prev_msg.opt_node
+            else:
+                prev_opt_node = env.message_log.get_opt_node(prev_msg)
+            if prev_opt_node is not None:
+                opt_latency = env.get_latency(prev_opt_node, self.rec_id)
                 return prev_opt_node, opt_latency
             # There is no optimal node because all slots are taken
             else:
                 return None, None
         else:
-            opt_node = self.env.get_closest_node(self.send_id)
-            if opt_node:
-                opt_latency = self.env.get_latency(self.send_id, opt_node)
+            opt_node = env.get_closest_node(self.send_id)
+            if opt_node is not None:
+                opt_latency = env.get_latency(self.send_id, opt_node)
                 return opt_node, opt_latency
             # There is no optimal node because all slots are taken
             else:
                 return None, None
-        
+
     def __str__(self):
         """String representation of a Message
 
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+
+class MessageLog(object):
+    # Column name -> (dtype, value for missing entries)
+    COLUMNS = {"timestamp": (np.float64, np.nan),
+               "msg_type": (np.int8, 0),
+               "send_id": (np.int64, -1),
+               "rec_id": (np.int64, -1),
+               "latency": (np.float64, np.nan),
+               "opt_node": (np.int64, -1),
+               "opt_latency": (np.float64, np.nan),
+               "discovered_node": (np.int64, -1),
+               "discovered_latency": (np.float64, np.nan),
+               "response": (np.bool_, False),
+               "prev_id": (np.int64, -1),
+               "rec_timestamp": (np.float64, np.nan)}
+
+    def __init__(self, capacity=1024):
+        """Growable struct-of-arrays log of all messages of the simulation
+        Message IDs are dense, so the row of a message is its ID
+        Missing IDs are stored as -1 and missing latencies and timestamps as NaN
+        The receiving timestamp is set once the recipient processed the message, messages in flight or to stopped clients have none
+
+        Args:
+            capacity (int, optional): Initial amount of rows, doubled whenever the log is full. Defaults to 1024.
+        """
+        self.size = 0
+        self.columns = {name: np.full(capacity, fill, dtype=dtype)
+                        for name, (dtype, fill) in self.COLUMNS.items()}
+
+    def __len__(self):
+        return self.size
+
+    def next_id(self):
+        """Returns the ID of the next message, which is the next free row of the log
+
+        Returns:
+            int: ID of the next message
+        """
+        return self.size
+
+    def grow(self, capacity):
+        """Enlarges all columns to at least the given capacity
+
+        Args:
+            capacity (int): Minimal amount of rows
+        """
+        old_capacity = len(self.columns["timestamp"])
+        if capacity <= old_capacity:
+            return
+        new_capacity = max(capacity, 2 * old_capacity)
+        for name, (dtype, fill) in self.COLUMNS.items():
+            column = np.full(new_capacity, fill, dtype=dtype)
+            column[:old_capacity] = self.columns[name]
+            self.columns[name] = column
+
+    def append(self, message):
+        """Writes a sent message into the row of its ID
+
+        Args:
+            message (Message): The sent message
+        """
+        row = message.id
+        self.grow(row + 1)
+        columns = self.columns
+        columns["timestamp"][row] = message.timestamp
+        columns["msg_type"][row] = message.msg_type
+        columns["send_id"][row] = message.send_id
+        columns["rec_id"][row] = message.rec_id
+        columns["latency"][row] = message.latency
+        columns["response"][row] = message.response
+        self.set_optimals(row, message.opt_node, message.opt_latency)
+        # The body of a node discovery is the ID of the discovered participant
+        if message.msg_type == 2 and isinstance(message.body, int):
+            columns["discovered_node"][row] = message.body
+        if message.discovered_latency is not None:
+            columns["discovered_latency"][row] = message.discovered_latency
+        if message.prev_msg_id is not None:
+            columns["prev_id"][row] = message.prev_msg_id
+        self.size = max(self.size, row + 1)
+
+    def set_optimals(self, msg_id, opt_node, opt_latency):
+        """Stores the theoretically optimal connection of a message
+
+        Args:
+            msg_id (int): ID of the message
+            opt_node (int): ID of the optimal node or None
+            opt_latency (float): Latency to the optimal node or None
+        """
+        self.columns["opt_node"][msg_id] = opt_node if opt_node is not None else -1
+        self.columns["opt_latency"][msg_id] = opt_latency if opt_latency is not None else np.nan
+
+    def receive(self, message, now):
+        """Marks a message as processed by its recipient
+
+        Args:
+            message (Message): The received message
+            now (float): Current simulation time
+        """
+        self.columns["rec_timestamp"][message.id] = now
+
+    def get_timestamp(self, msg_id):
+        """Returns the sending time of a message
+
+        Args:
+            msg_id (int): ID of the message
+
+        Returns:
+            float: Simulation time the message was sent at
+        """
+        return float(self.columns["timestamp"][msg_id])
+
+    def get_opt_node(self, msg_id):
+        """Returns the optimal node of a message
+
+        Args:
+            msg_id (int): ID of the message
+
+        Returns:
+            int: ID of the optimal node or None if the message has none or is unknown
+        """
+        if msg_id is None or not 0 <= msg_id < self.size:
+            return None
+        opt_node = int(self.columns["opt_node"][msg_id])
+        return opt_node if opt_node >= 0 else None
+
+    def column(self, name):
+        """Returns a view on the used rows of a column
+
+        Args:
+            name (str): Name of the column
+
+        Returns:
+            ndarray: Values of the column indexed by message ID
+        """
+        return self.columns[name][:self.size]
+
+    def to_frame(self):
+        """Copies the used rows of the log into a DataFrame indexed by message ID
+
+        Returns:
+            DataFrame: One row per message with the columns of the log
+        """
+        df = pd.DataFrame({name: self.column(name).copy()
+                           for name in self.columns})
+        df.index.name = "msg_id"
+        return df
@@ -1,11 +1,26 @@
 import pandas as pd
 import numpy as np
 from functools import reduce
+from scipy.stats import norm
 
 
 class Metrics(object):
-    def __init__(self, env):
+    def __init__(self, env, confidence=0.95):
+        """Metric collector of a finished simulation
+        All message metrics are computed vectorized on the columnar message log of the environment
+
+        Args:
+            env (FogEnvironment): Fog Environment of the simulation
+            confidence (float, optional): Confidence level of the intervals of the error metrics. Defaults to 0.95.
+        """
         self.env = env
+        # Two-sided quantile of the standard normal distribution
+        self.z = norm.ppf(0.5 + confidence/2)
+        # Optima of a deferred oracle are still pending for the last messages
+        env.oracle.flush()
+        self.messages = env.message_log.to_frame()
+        self.client_ids = np.array([client["id"] for client in env.clients], dtype=np.int64)
+        self.node_ids = np.array([node["id"] for node in env.nodes], dtype=np.int64)
 
     def all_client(self):
         """Collects all client metrics and returns them in a single dataframe
@@ -20,9 +35,13 @@ class Metrics(object):
         active = self.collect_active_time()
         opt_mse = self.collect_optimal_error()
         disc_mse = self.collect_discovery_error()
-        data_frames = [rec, lat, count, lost, active, opt_mse, disc_mse]
+        gossip = self.collect_gossip(self.env.clients, "client_id")
+        data_frames = [rec, lat, count, lost, active, opt_mse, disc_mse, gossip]
         df_merged = reduce(lambda left, right: pd.merge(left, right, on=["client_id"],
                                                         how='outer'), data_frames)
+        # Map the internal integer IDs back to the IDs of the plans XML
+        df_merged["client_id"] = df_merged["client_id"].map(
+            self.env.get_external_id)
         return df_merged
 
     def all_time(self):
@@ -47,27 +66,60 @@ class Metrics(object):
         """
         workload = self.collect_workload()
         messages = self.collect_node_messages()
-        data_frames = [workload, messages]
+        gossip = self.collect_gossip(self.env.nodes, "node_id")
+        data_frames = [workload, messages, gossip]
         df_merged = reduce(lambda left, right: pd.merge(left, right, on=["node_id"],
                                                         how='outer'), data_frames)
+        # Map the internal integer IDs back to the UUIDs of the nodes
+        df_merged["node_id"] = df_merged["node_id"].map(
+            self.env.get_external_id)
         return df_merged
 
+    def sent_by(self, ids):
+        """Selects all messages sent by the given participants
+
+        Args:
+            ids (ndarray): IDs of the participants
+
+        Returns:
+            DataFrame: Rows of the message log
+        """
+        return self.messages[self.messages["send_id"].isin(ids)]
+
+    def received_by(self, ids):
+        """Selects all messages which were processed by the given participants
+
+        Args:
+            ids (ndarray): IDs of the participants
+
+        Returns:
+            DataFrame: Rows of the message log
+        """
+        messages = self.messages
+        return messages[messages["rec_id"].isin(ids) & messages["rec_timestamp"].notna()]
+
+    def per_client(self, values, fill_value=np.nan):
+        """Aligns a Series indexed by client ID to all clients of the simulation
+
+        Args:
+            values (Series): Values indexed by client ID
+            fill_value (any, optional): Value for clients without entry. Defaults to NaN.
+
+        Returns:
+            ndarray: Values ordered like the clients of the environment
+        """
+        return values.reindex(self.client_ids, fill_value=fill_value).to_numpy()
+
     def collect_reconnections(self):
         """Counts how often a client requests a new connection (msg_type 2)
 
         Returns:
             DataFrame: DataFrame filled with the reconnections per client
         """
-        reconnections = []
-        for client in self.env.clients:
-            counter = len(
-                list(filter(lambda msg: msg.msg_type == 2, client["obj"].out_msg_history)))
-            reconnections.append(
-                {"client_id": client["obj"].id, "reconnections": counter})
-        df = pd.DataFrame(data=reconnections, columns=[
-            "client_id", "reconnections"])
-
-        return df
+        out_msgs = self.sent_by(self.client_ids)
+        counter = out_msgs[out_msgs["msg_type"] == 2].groupby("send_id").size()
+        return pd.DataFrame({"client_id": self.client_ids,
+                             "reconnections": self.per_client(counter, fill_value=0)})
 
     def collect_latency(self):
         """Collects the average, min and max latency for each client
@@ -75,20 +127,17 @@ class Metrics(object):
         Returns:
             DataFrame: DataFrame filled with the latencies
         """
-        data = []
-        for client in self.env.clients:
-            latencies = []
-            history = [*client["obj"].in_msg_history,
-                       *client["obj"].out_msg_history]
-            for message in history:
-                if message.msg_type != 3:
-                    latencies.append(message.latency)
-
-            data.append({"client_id": client["obj"].id, "lat_mean": round(np.mean(
-                latencies)*1000, 3), "lat_max": round(np.max(latencies)*1000, ), "lat_min": round(np.min(latencies)*1000, 3)})
-        df = pd.DataFrame(data=data, columns=[
-                          "client_id", "lat_mean", "lat_max", "lat_min"])
-        return df
+        in_msgs = self.received_by(self.client_ids)
+        out_msgs = self.sent_by(self.client_ids)
+        in_msgs = in_msgs[in_msgs["msg_type"] != 3]
+        out_msgs = out_msgs[out_msgs["msg_type"] != 3]
+        latencies = pd.DataFrame({"client_id": np.concatenate((in_msgs["rec_id"].to_numpy(), out_msgs["send_id"].to_numpy())),
+                                  "latency": np.concatenate((in_msgs["latency"].to_numpy(), out_msgs["latency"].to_numpy()))})
+        stats = latencies.groupby("client_id")["latency"].agg(["mean", "max", "min"]) * 1000
+        return pd.DataFrame({"client_id": self.client_ids,
+                             "lat_mean": self.per_client(stats["mean"].round(3)),
+                             "lat_max": self.per_client(stats["max"].round()),
+                             "lat_min": self.per_client(stats["min"].round(3))})
 
     def collect_message_count(self):
         """Counts the total, incoming and outgoing messages for each client
@@ -96,37 +145,21 @@ class Metrics(object):
         Returns:
             DataFrame: DataFrame filled with the message counts
         """
-        data = []
-        for client in self.env.clients:
-            history = [*client["obj"].in_msg_history,
-                       *client["obj"].out_msg_history]
-
-            data.append({"client_id": client["obj"].id, "total_msgs": len(history),  "out_msgs": len(client["obj"].out_msg_history),
-                         "in_msgs": len(client["obj"].in_msg_history)})
-        df = pd.DataFrame(data=data, columns=[
-                          "client_id", "total_msgs", "out_msgs", "in_msgs"])
-        return df
+        out_msgs = self.per_client(self.sent_by(self.client_ids).groupby("send_id").size(), fill_value=0)
+        in_msgs = self.per_client(self.received_by(self.client_ids).groupby("rec_id").size(), fill_value=0)
+        return pd.DataFrame({"client_id": self.client_ids, "total_msgs": out_msgs + in_msgs,
+                             "out_msgs": out_msgs, "in_msgs": in_msgs})
 
     def collect_lost_messages(self):
         """Counts the total lost messages for each client
+        A message is lost if the client did not process a response to it within the request timeout, the counts are taken from the pending requests of the environment
 
         Returns:
             DataFrame: DataFrame filled with the message counts
         """
-        data = []
-        for client in self.env.clients:
-            filtered_in_history = list(
-                filter(lambda message: message.msg_type != 3, client["obj"].in_msg_history))
-            filtered_out_history = list(
-                filter(lambda message: message.msg_type != 3, client["obj"].out_msg_history))
-            in_ids = list(
-                map(lambda msg: msg.prev_msg.id, filtered_in_history))
-            match_ids = list(
-                filter(lambda msg: msg.id not in in_ids, filtered_out_history))
-            data.append(
-                {"client_id": client["obj"].id, "lost_msgs": len(match_ids)})
-        return pd.DataFrame(data=data, columns=[
-            "client_id", "lost_msgs"])
+        lost = pd.Series(self.env.pending_requests.get_lost(self.env.now), dtype=np.int64)
+        return pd.DataFrame({"client_id": self.client_ids,
+                             "lost_msgs": self.per_client(lost, fill_value=0)})
 
     def collect_active_time(self):
         """Counts how long the client was active in the simulation
@@ -134,76 +167,105 @@ class Metrics(object):
         Returns:
             DataFrame: DataFrame filled with the active time per client
         """
-        data = []
-        for client in self.env.clients:
-            first_msg = client["obj"].out_msg_history[0]
-            last_msg = client["obj"].out_msg_history[-1]
-            active_time = round(last_msg.timestamp - first_msg.timestamp)
-            data.append(
-                {"client_id": client["obj"].id, "active_time": active_time})
-        return pd.DataFrame(data=data, columns=["client_id", "active_time"])
+        timestamps = self.sent_by(self.client_ids).groupby("send_id")["timestamp"].agg(["min", "max"])
+        active_time = (timestamps["max"] - timestamps["min"]).round()
+        return pd.DataFrame({"client_id": self.client_ids,
+                             "active_time": self.per_client(active_time)})
+
+    def collect_errors(self, client_ids, y_true, y_opt, opt_choice, rmse_name, rate_name):
+        """Aggregates the root-mean-square-error and the rate of optimal choices per client with confidence intervals
+        The rate uses the Wilson score interval, the interval of the rmse is the normal approximation of the mean square error
+
+        Args:
+            client_ids (ndarray): Client ID of every sample
+            y_true (ndarray): Actual values in ms
+            y_opt (ndarray): Optimal values in ms
+            opt_choice (ndarray): Whether the optimal node was chosen
+            rmse_name (str): Column name of the root-mean-square-error
+            rate_name (str): Column name of the rate
+
+        Returns:
+            DataFrame: Errors, rates, their lower and upper bounds and the amount of samples per client, clients without samples get the fill values of the point estimates
+        """
+        samples = pd.DataFrame({"client_id": client_ids, "square_error": np.square(y_true - y_opt),
+                                "opt_choice": opt_choice})
+        grouped = samples.groupby("client_id")
+        n = grouped.size()
+        mse = grouped["square_error"].mean()
+        # A single sample has no standard deviation, its interval has zero width
+        mse_margin = (self.z * grouped["square_error"].std() / np.sqrt(n)).fillna(0)
+        rate = grouped["opt_choice"].mean()
+        z2 = self.z**2
+        center = (rate + z2/(2*n)) / (1 + z2/n)
+        rate_margin = self.z / (1 + z2/n) * np.sqrt(rate*(1 - rate)/n + z2/(4*n**2))
+        return pd.DataFrame({"client_id": self.client_ids,
+                             rmse_name: self.per_client(np.sqrt(mse).round(3)),
+                             rmse_name + "_lower": self.per_client(np.sqrt((mse - mse_margin).clip(lower=0)).round(3)),
+                             rmse_name + "_upper": self.per_client(np.sqrt(mse + mse_margin).round(3)),
+                             rate_name: self.per_client(rate.round(2), fill_value=0),
+                             rate_name + "_lower": self.per_client((center - rate_margin).clip(lower=0).round(2), fill_value=0),
+                             rate_name + "_upper": self.per_client((center + rate_margin).clip(upper=1).round(2), fill_value=0),
+                             rate_name + "_samples": self.per_client(n, fill_value=0)})
 
     def collect_optimal_error(self):
         """Computes the mean-square-error for every message from type 1 of the optimal latency and the actual latency
         Computes the percentage how often the client connects to the perfect node 
+        Only messages evaluated by the oracle are taken into account
 
         Returns:
-            DataFrame: DataFrame filled with the roundtrip-time-mse and perfect connerction rate per client
+            DataFrame: DataFrame filled with the roundtrip-time-mse and perfect connerction rate per client with confidence intervals
         """
-        data = []
-        for client in self.env.clients:
-            # Actual rtt
-            y_true = []
-            # Optimal rtt
-            y_opt = []
-            # counter for chosing the optimal node
-            opt_choice = 0
-            for in_msg in client["obj"].in_msg_history:
-                if(in_msg.prev_msg and in_msg.msg_type == 1 and in_msg.opt_latency):
-                    # Retrieve request for the incoming response
-                    out_msg = next(
-                        (message for message in client["obj"].out_msg_history if message.id == in_msg.prev_msg.id), None)
-                    y_true.append((out_msg.latency + in_msg.latency) * 1000)
-                    y_opt.append(
-                        (out_msg.opt_latency + in_msg.opt_latency)*1000)
-                    # Counter of optimal node choice
-                    opt_choice = opt_choice + 1 if in_msg.opt_node == in_msg.send_id else opt_choice
-
-            opt_rate = opt_choice/len(y_true) if len(y_true) > 0 else 0
-            mse = round(
-                np.sqrt(np.square(np.subtract(y_true, y_opt)).mean()), 3)
-            data.append(
-                {"client_id": client["obj"].id, "rtt_rmse": mse, "opt_rate": round(opt_rate, 2)})
-        return pd.DataFrame(data=data, columns=["client_id", "rtt_rmse", "opt_rate"])
+        in_msgs = self.received_by(self.client_ids)
+        responses = in_msgs[(in_msgs["prev_id"] >= 0) & (in_msgs["msg_type"] == 1) &
+                            in_msgs["opt_latency"].notna() & (in_msgs["opt_latency"] != 0)]
+        # Retrieve requests for the incoming responses
+        requests = self.messages.loc[responses["prev_id"].to_numpy()]
+        # Actual and optimal rtt
+        y_true = (requests["latency"].to_numpy() + responses["latency"].to_numpy()) * 1000
+        y_opt = (requests["opt_latency"].to_numpy() + responses["opt_latency"].to_numpy()) * 1000
+        opt_choice = (responses["opt_node"] == responses["send_id"]).to_numpy()
+        return self.collect_errors(responses["rec_id"].to_numpy(), y_true, y_opt, opt_choice,
+                                   "rtt_rmse", "opt_rate")
 
     def collect_discovery_error(self):
         """Computes the mean-square-error for every message from type 2 of the optimal latency and the latency to the suggested node
         Computes the percentage how often the client is suggested the perfect node
+        Only messages evaluated by the oracle are taken into account
 
         Returns:
-            DataFrame: DataFrame filled with the latency-mse and perfect suggestion rate per client
+            DataFrame: DataFrame filled with the latency-mse and perfect suggestion rate per client with confidence intervals
+        """
+        in_msgs = self.received_by(self.client_ids)
+        responses = in_msgs[(in_msgs["msg_type"] == 2) & in_msgs["response"] &
+                            in_msgs["opt_latency"].notna() & (in_msgs["opt_latency"] != 0) &
+                            in_msgs["discovered_latency"].notna() & (in_msgs["discovered_latency"] != 0)]
+        # Actual latency to discovered node and latency to optimal node
+        y_true = responses["discovered_latency"].to_numpy() * 1000
+        y_opt = responses["opt_latency"].to_numpy() * 1000
+        opt_choice = (responses["opt_node"] == responses["discovered_node"]).to_numpy()
+        return self.collect_errors(responses["rec_id"].to_numpy(), y_true, y_opt, opt_choice,
+                                   "discovery_rmse", "discovery_rate")
+
+    def collect_gossip(self, participants, id_column):
+        """Collects the size of the gossip and the time spent merging gossip for each participant
+
+        Args:
+            participants (list): {"id", "obj"} entries of the clients or nodes
+            id_column (str): Name of the ID column, either client_id or node_id
+
+        Returns:
+            DataFrame: DataFrame filled with the final and maximal gossip size, the amount of merges and the mean merge time in microseconds, 0 without merges
         """
-        data = []
-        for client in self.env.clients:
-            # Actual latency to discovered node
-            y_true = []
-            # Latency to optimal node
-            y_opt = []
-            # counter for chosing the optimal node
-            opt_choice = 0
-            for in_msg in (x for x in client["obj"].in_msg_history if x.msg_type == 2 and x.response):
-                if in_msg.opt_latency and in_msg.discovered_latency:
-                    y_true.append(in_msg.discovered_latency*1000)
-                    y_opt.append(in_msg.opt_latency*1000)
-                    # Counter of optimal node choice
-                    opt_choice = opt_choice + 1 if in_msg.opt_node == in_msg.body else opt_choice
-
-            opt_rate = opt_choice/len(y_true) if len(y_true) > 0 else 0
-            rmse = round(
-                np.sqrt(np.square(np.subtract(y_true, y_opt)).mean()), 3)
-            data.append(
-                {"client_id": client["obj"].id, "discovery_rmse": rmse, "discovery_rate": round(opt_rate, 2)})
-        return pd.DataFrame(data=data, columns=["client_id", "discovery_rmse", "discovery_rate"])
+        tables = [participant["obj"].gossip for participant in participants]
+        merges = np.array([table.merges for table in tables], dtype=np.float64)
+        merge_time = np.array([table.merge_time for table in tables], dtype=np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            merge_us = np.where(merges > 0, merge_time / merges * 1e6, 0)
+        return pd.DataFrame({id_column: [participant["id"] for participant in participants],
+                             "gossip_size": [len(table) for table in tables],
+                             "gossip_max_size": [table.max_size for table in tables],
+                             "gossip_merges": merges.astype(np.int64),
+                             "gossip_merge_us": np.round(merge_us, 2)})
 
     def collect_workload_deviation(self):
         """Computes the mean-square-error for every message from type 2 of the optimal latency and the latency to the suggested node
@@ -212,33 +274,36 @@ class Metrics(object):
         Returns:
             DataFrame: DataFrame filled with the latency-mse and perfect suggestion rate per client
         """
-        data = []
-        for node in self.env.nodes:
-            for entry in node.get("obj").workload:
-                data.append(
-                    {"timestamp": entry.get('timestamp'), "workload": entry.get('workload')})
-
-        df = pd.DataFrame(data=data, columns=["timestamp", "workload"])
+        clients, slots = self.get_workload()
+        df = pd.DataFrame({"timestamp": np.tile(np.arange(clients.shape[1]), clients.shape[0]),
+                           "workload": (clients / slots).ravel()})
         df = df.groupby("timestamp").agg(['std', 'mean', 'min', 'max', ])
         return df
 
+    def get_workload(self):
+        """Returns the sampled workload matrix of the environment
+
+        Returns:
+            ndarray: Connected clients of shape (nodes, seconds), rows are ordered like the nodes
+            ndarray: Slots of the nodes as column vector
+        """
+        slots = np.array([node["obj"].slots for node in self.env.nodes], dtype=np.float64)[:, np.newaxis]
+        if self.env.workload is None:
+            return np.zeros((len(self.env.nodes), 0)), slots
+        return self.env.workload[:, :self.env.workload_samples].astype(np.float64), slots
+
     def collect_unique_discovery(self):
         """Computes the unique discoveries per timestep
         
         Returns:
             DataFrame: DataFrame filled with the Unique discoveries per timestep
         """
-        data = []
-        for node in self.env.nodes:
-            for message in filter(lambda msg: msg.msg_type == 2, node.get('obj').out_msg_history):
-                data.append({"timestamp": np.ceil(
-                    message.timestamp), "discovery": message.body})
-        # Define internal function that creates a set out of the messages of a timestep to count uniques
-        def func(messages): return len(set(messages))
-        df = pd.DataFrame(data=data, columns=["timestamp", "discovery"])
+        out_msgs = self.sent_by(self.node_ids)
+        out_msgs = out_msgs[out_msgs["msg_type"] == 2]
+        df = pd.DataFrame({"timestamp": np.ceil(out_msgs["timestamp"].to_numpy()),
+                           "discovery": out_msgs["discovered_node"].to_numpy()})
         df = df.groupby(["timestamp"])['discovery'].agg(
-            [('unique discoveries', func)])
-        df.reset_index()
+            [('unique discoveries', 'nunique')])
         return df
 
     def collect_total_messages_over_time(self):
@@ -247,65 +312,43 @@ class Metrics(object):
         Returns:
             DataFrame: DataFrame filled with the total messages per timestep
         """
-        data = []
-
-        for elem in [*self.env.nodes, *self.env.clients]:
-            for message in elem.get('obj').out_msg_history:
-                data.append({"timestamp": np.ceil(message.timestamp)})
-
-        df = pd.DataFrame(data=data, columns=["timestamp"])
+        out_msgs = self.sent_by(np.concatenate((self.node_ids, self.client_ids)))
+        df = pd.DataFrame({"timestamp": np.ceil(out_msgs["timestamp"].to_numpy())})
         df = df.groupby(["timestamp"]).size(
         ).reset_index(name='total messages')
-        df.reset_index()
         return df
 
     def collect_error_over_time(self):
         """Computes the mean-square-error for every message from type 2 of the optimal latency and the latency to the suggestes node
-        Computes the percentage how often the client is suggested the perfect node
 
         Returns:
-            DataFrame: DataFrame filled with the latency-mse and perfect suggestion rate per client
+            Series: Root-mean-square-error of the discoveries per timestep
         """
-        data = []
-        for client in self.env.clients:
-
-            # counter for chosing the optimal node
-            opt_choice = []
-            for in_msg in (x for x in client["obj"].in_msg_history if x.msg_type == 2):
-                if in_msg.opt_latency and in_msg.discovered_latency:
-                    y_true = in_msg.discovered_latency * 1000
-                    y_opt = in_msg.opt_latency * 1000
-                    # Counter of optimal node choice
-                    opt_choice.append(1 if in_msg.opt_node ==
-                                      in_msg.body else 0)
-                    timestamp = round(in_msg.timestamp)
-                    data.append(
-                        {"timestamp": np.ceil(timestamp), "y_true": y_true, "y_opt": y_opt, "discovery_rate": sum(opt_choice)/len(opt_choice)})
-        df = pd.DataFrame(data=data, columns=[
-                          "timestamp", "y_true", "y_opt", "discovery_rate"])
-
-        df = df.groupby("timestamp").apply(
-            lambda x: np.sqrt(np.square(np.subtract(x.y_true, x.y_opt)).mean()))
-        return df
+        in_msgs = self.received_by(self.client_ids)
+        in_msgs = in_msgs[(in_msgs["msg_type"] == 2) &
+                          in_msgs["opt_latency"].notna() & (in_msgs["opt_latency"] != 0) &
+                          in_msgs["discovered_latency"].notna() & (in_msgs["discovered_latency"] != 0)]
+        df = pd.DataFrame({"timestamp": np.ceil(np.round(in_msgs["timestamp"].to_numpy())),
+                           "square_error": np.square((in_msgs["discovered_latency"] - in_msgs["opt_latency"]).to_numpy() * 1000)})
+        return np.sqrt(df.groupby("timestamp")["square_error"].mean())
 
     def collect_opt_choice_over_time(self):
-        """Computes the mean-square-error for every message from type 2 of the optimal latency and the latency to the suggestes node
-        Computes the percentage how often the client is suggested the perfect node
+        """Computes the running rate per client how often the client is suggested the perfect node
+        Averages the rates of all clients per timestep
+        Only messages evaluated by the oracle are taken into account
 
         Returns:
-            DataFrame: DataFrame filled with the latency-mse and perfect suggestion rate per client
+            DataFrame: DataFrame filled with the perfect suggestion rate per timestep
         """
-        data = []
-        for client in self.env.clients:
-            # counter for chosing the optimal node
-            opt_choice = []
-            for in_msg in (x for x in client["obj"].in_msg_history if x.msg_type == 2):
-                # Counter of optimal node choice
-                opt_choice.append(1 if in_msg.opt_node == in_msg.body else 0)
-                timestamp = round(in_msg.timestamp)
-                data.append(
-                    {"timestamp": np.ceil(timestamp),  "opt_choice": sum(opt_choice)/len(opt_choice)})
-        df = pd.DataFrame(data=data, columns=["timestamp", "opt_choice"])
+        in_msgs = self.received_by(self.client_ids)
+        in_msgs = in_msgs[(in_msgs["msg_type"] == 2) & in_msgs["opt_latency"].notna()]
+        # Replay the responses in the order the clients processed them
+        in_msgs = in_msgs.sort_values(["rec_id", "rec_timestamp"], kind="mergesort")
+        opt_choice = (in_msgs["opt_node"] == in_msgs["discovered_node"]).astype(np.int64)
+        grouped = opt_choice.groupby(in_msgs["rec_id"])
+        running_rate = grouped.cumsum() / (grouped.cumcount() + 1)
+        df = pd.DataFrame({"timestamp": np.ceil(np.round(in_msgs["timestamp"].to_numpy())),
+                           "opt_choice": running_rate.to_numpy()})
         df = df.groupby("timestamp").agg("mean")
         return df
 
@@ -315,31 +358,25 @@ class Metrics(object):
         Returns:
             DataFrame: DataFrame filled with the min, mean and max workload and bandwidth per node
         """
-        data = []
-        for node in self.env.nodes:
-            workloads = [elem.get(
-                'workload') for elem in node["obj"].workload if elem.get('timestamp') > 10]
-            clients = [elem.get('clients') for elem in node["obj"].workload if elem.get(
-                'timestamp') > 10]
-            avg_workload = round(np.mean(workloads), 2)
-            max_workload = round(np.max(workloads), 2)
-            min_workload = round(np.min(workloads), 2)
-            avg_clients = round(np.mean(clients))
-            min_clients = round(np.min(clients))
-            max_clients = round(np.max(clients))
-            min_bandwidth = min(
-                1, max(0.1, 1 - (1/(node["obj"].slots)) * (max_clients - 1)))
-            avg_bandwidth = min(
-                1, max(0.1, 1 - (1/(node["obj"].slots)) * (avg_clients - 1)))
-            max_bandwidth = min(
-                1, max(0.1, 1 - (1/(node["obj"].slots)) * (min_clients - 1)))
-            data.append(
-                {"node_id": node["obj"].id, "avg workload": avg_workload, "min workload": min_workload, "max workload": max_workload,
-                 "avg clients": avg_clients, "min clients": min_clients, "max clients": max_clients,
-                 'avg bandwidth': avg_bandwidth, 'min bandwidth': min_bandwidth, 'max bandwidth': max_bandwidth})
-        return pd.DataFrame(data=data, columns=["node_id", "avg workload", "min workload", "max workload",
-                                                "avg clients", "min clients", "max clients",
-                                                "avg bandwidth", "min bandwidth", "max bandwidth"])
+        clients, slots = self.get_workload()
+        # Warm up phase is not taken into account
+        clients = clients[:, 11:]
+        if clients.shape[1] == 0:
+            clients = np.full((len(self.node_ids), 1), np.nan)
+        workloads = clients / slots
+        avg_clients = np.round(clients.mean(axis=1))
+        min_clients = np.round(clients.min(axis=1))
+        max_clients = np.round(clients.max(axis=1))
+        slots = slots[:, 0]
+
+        def bandwidth(amount_clients): return np.minimum(1, np.maximum(0.1, 1 - (1/slots) * (amount_clients - 1)))
+        return pd.DataFrame({"node_id": self.node_ids,
+                             "avg workload": np.round(workloads.mean(axis=1), 2),
+                             "min workload": np.round(workloads.min(axis=1), 2),
+                             "max workload": np.round(workloads.max(axis=1), 2),
+                             "avg clients": avg_clients, "min clients": min_clients, "max clients": max_clients,
+                             "avg bandwidth": bandwidth(avg_clients), "min bandwidth": bandwidth(max_clients),
+                             "max bandwidth": bandwidth(min_clients)})
 
     def collect_node_messages(self):
         """Computes the total, outgoing and incoming message load per Node
@@ -347,14 +384,9 @@ class Metrics(object):
         Returns:
             DataFrame: DataFrame filled with the total message load per node
         """
-        
-        data = []
-        for node in self.env.nodes:
-            history = [*node["obj"].in_msg_history,
-                       *node["obj"].out_msg_history]
-
-            data.append({"node_id": node["obj"].id, "total_msgs": len(history),  "out_msgs": len(node["obj"].out_msg_history),
-                         "in_msgs": len(node["obj"].in_msg_history)})
-        df = pd.DataFrame(data=data, columns=[
-                          "node_id", "total_msgs", "out_msgs", "in_msgs"])
-        return df
+        out_msgs = self.sent_by(self.node_ids).groupby("send_id").size().reindex(
+            self.node_ids, fill_value=0).to_numpy()
+        in_msgs = self.received_by(self.node_ids).groupby("rec_id").size().reindex(
+            self.node_ids, fill_value=0).to_numpy()
+        return pd.DataFrame({"node_id": self.node_ids, "total_msgs": out_msgs + in_msgs,
+                             "out_msgs": out_msgs, "in_msgs": in_msgs})
@@ -0,0 +1,245 @@
+import math
+import numpy as np
+
+
+class MobilityStore(object):
+    def __init__(self, env):
+        """Piecewise-linear trajectories of all clients in one set of arrays
+        The trips of every plan are compiled into linear legs, the legs of all clients are stored back to back and a client's legs are found by its offsets
+        Positions are not stored per client but evaluated from the simulation time, either for one client or for all clients in one vectorized pass
+        Times of the legs are relative to the start of the client's movement
+
+        Args:
+            env (FogEnvironment): Fog Environment of the simulation
+        """
+        self.env = env
+        # Per leg, filled while clients are added and kept for the scalar lookups: start and end time, start coordinates and velocity
+        self.leg_lists = {"start": [], "end": [], "x": [], "y": [], "vel_x": [], "vel_y": []}
+        # Per client, filled while clients are added: start coordinates and the offset of the first leg
+        self.start_lists = {"x": [], "y": []}
+        self.offset_list = [0]
+        # Compiled arrays of the lists above, rebuilt when clients were added since the last compilation
+        self.legs = None
+        self.starts = None
+        self.offsets = None
+        # Per leg: time the leg leaves the bounds relative to the start of the movement, inf if it stays in bounds
+        self.exits = None
+        # Per client: simulation time the movement started and stopped, the position does not change before the start and after the stop
+        self.start_time = np.empty(0, dtype=np.float64)
+        self.stop_time = np.empty(0, dtype=np.float64)
+        # Per client: index of the current leg, only moves forward like the simulation time
+        self.leg = np.empty(0, dtype=np.int64)
+        # Positions of all clients of the last vectorized evaluation
+        self.timestamp = None
+        self.x = None
+        self.y = None
+
+    def __len__(self):
+        return len(self.offset_list) - 1
+
+    def add_client(self, trips):
+        """Compiles the trips of a client's plan into legs, legs the client does not move on are skipped
+        The client starts at the coordinates of its first trip
+
+        Args:
+            trips (tuple): x coordinates, y coordinates and travel times in seconds of the trips, as returned by TripPlans.get_trips
+
+        Returns:
+            int: Index of the client in the store
+        """
+        legs = self.leg_lists
+        trips_x, trips_y, durations = (np.asarray(column).tolist() for column in trips)
+        phy_x, phy_y = trips_x[0], trips_y[0]
+        x, y, offset = phy_x, phy_y, 0
+        for to_x, to_y, duration in zip(trips_x, trips_y, durations):
+            # skip this leg, if the duration is lower than 1 second
+            if(duration < 1):
+                continue
+            dist_x = to_x - x
+            dist_y = to_y - y
+            # skip this leg if we are not going anywhere, threshold of 10 because sometimes its weird
+            if -10 < dist_x < 10 and -10 < dist_y < 10:
+                continue
+            # skip this leg if the client already matches the end point in one coordinate
+            if round(to_x, 2) == round(x, 2) or round(to_y, 2) == round(y, 2):
+                continue
+            legs["start"].append(offset)
+            legs["end"].append(offset + duration)
+            legs["x"].append(x)
+            legs["y"].append(y)
+            legs["vel_x"].append(dist_x / duration)
+            legs["vel_y"].append(dist_y / duration)
+            x, y, offset = to_x, to_y, offset + duration
+        self.start_lists["x"].append(phy_x)
+        self.start_lists["y"].append(phy_y)
+        self.offset_list.append(len(legs["start"]))
+        self.legs = None
+        return len(self) - 1
+
+    def compile(self):
+        """Converts the legs into arrays and calculates when they leave the bounds of the simulation
+        Being on a bound counts as out of bounds, clients which are added later keep the state of the existing clients
+        """
+        self.legs = {name: np.array(values, dtype=np.float64)
+                     for name, values in self.leg_lists.items()}
+        self.starts = {name: np.array(values, dtype=np.float64)
+                       for name, values in self.start_lists.items()}
+        self.offsets = np.array(self.offset_list, dtype=np.int64)
+        added = len(self) - len(self.start_time)
+        self.start_time = np.append(self.start_time, np.full(added, np.nan))
+        self.stop_time = np.append(self.stop_time, np.full(added, np.inf))
+        self.leg = np.append(self.leg, self.offsets[len(self.leg):-1])
+        self.timestamp = None
+
+        legs = self.legs
+        duration = legs["end"] - legs["start"]
+        self.exits = np.full(len(duration), np.inf)
+        if not self.env.boundaries:
+            return
+        (x_lower, x_upper, y_lower, y_upper) = self.env.boundaries
+        exit_offset = np.full(len(duration), np.inf)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for start, velocity, lower, upper in ((legs["x"], legs["vel_x"], x_lower, x_upper),
+                                                  (legs["y"], legs["vel_y"], y_lower, y_upper)):
+                crossing = np.where(velocity > 0, (upper - start) / velocity,
+                                    np.where(velocity < 0, (lower - start) / velocity, np.inf))
+                crossing[~((lower < start) & (start < upper))] = 0
+                exit_offset = np.minimum(exit_offset, crossing)
+        leaves = exit_offset <= duration
+        self.exits[leaves] = legs["start"][leaves] + exit_offset[leaves]
+
+    def start(self, index, now):
+        """Starts the movement of a client along its legs
+
+        Args:
+            index (int): Index of the client
+            now (float): Current simulation time
+        """
+        if self.legs is None:
+            self.compile()
+        self.start_time[index] = now
+
+    def stop(self, index, now):
+        """Stops the movement of a client, the client keeps its current position
+
+        Args:
+            index (int): Index of the client
+            now (float): Current simulation time
+        """
+        if self.legs is None:
+            self.compile()
+        self.stop_time[index] = min(self.stop_time[index], now)
+
+    def get_leg_count(self, index):
+        """Amount of legs of a client
+
+        Args:
+            index (int): Index of the client
+
+        Returns:
+            int: Amount of legs
+        """
+        return self.offset_list[index + 1] - self.offset_list[index]
+
+    def get_next_event(self, index, leg):
+        """Simulation time a client reaches the end of a leg or leaves the bounds on it
+
+        Args:
+            index (int): Index of the client
+            leg (int): Index of the leg among the legs of the client
+
+        Returns:
+            float: Time of the event
+            boolean: Whether the client leaves the bounds
+        """
+        if self.legs is None:
+            self.compile()
+        row = self.offsets[index] + leg
+        start_time = float(self.start_time[index])
+        if math.isinf(self.exits[row]):
+            return start_time + float(self.legs["end"][row]), False
+        return start_time + float(self.exits[row]), True
+
+    def get_position(self, index, now):
+        """Interpolates the position of one client
+
+        Args:
+            index (int): Index of the client
+            now (float): Current simulation time, must not decrease between calls
+
+        Returns:
+            float: x coordinate in GK4/EPSG:31468
+            float: y coordinate in GK4/EPSG:31468
+        """
+        if self.legs is None:
+            self.compile()
+        if now == self.timestamp:
+            return float(self.x[index]), float(self.y[index])
+        start_time = float(self.start_time[index])
+        first, last = self.offset_list[index], self.offset_list[index + 1]
+        if math.isnan(start_time) or first == last:
+            return self.start_lists["x"][index], self.start_lists["y"][index]
+        # Scalar access is faster on the lists than on the arrays
+        legs = self.leg_lists
+        offset = min(now, float(self.stop_time[index])) - start_time
+        row = int(self.leg[index])
+        while row < last - 1 and offset >= legs["end"][row]:
+            row += 1
+        self.leg[index] = row
+        elapsed = min(max(offset - legs["start"][row], 0), legs["end"][row] - legs["start"][row])
+        return (legs["x"][row] + legs["vel_x"][row] * elapsed,
+                legs["y"][row] + legs["vel_y"][row] * elapsed)
+
+    def evaluate(self, now):
+        """Interpolates the positions of all clients in one vectorized pass and flags the clients out of bounds
+        The positions are kept until the simulation time advances
+
+        Args:
+            now (float): Current simulation time, must not decrease between calls
+
+        Returns:
+            ndarray: x coordinates of all clients ordered by index
+            ndarray: y coordinates of all clients ordered by index
+            ndarray: Whether a moving client is out of bounds
+        """
+        if self.legs is None:
+            self.compile()
+        legs = self.legs
+        x, y = self.starts["x"].copy(), self.starts["y"].copy()
+        moving = ~np.isnan(self.start_time) & (self.offsets[1:] > self.offsets[:-1])
+        if moving.any():
+            clients = np.flatnonzero(moving)
+            offset = np.minimum(now, self.stop_time[clients]) - self.start_time[clients]
+            rows = self.leg[clients]
+            last = self.offsets[clients + 1] - 1
+            while True:
+                advance = (rows < last) & (offset >= legs["end"][rows])
+                if not advance.any():
+                    break
+                rows[advance] += 1
+            self.leg[clients] = rows
+            elapsed = np.clip(offset - legs["start"][rows], 0, legs["end"][rows] - legs["start"][rows])
+            x[clients] = legs["x"][rows] + legs["vel_x"][rows] * elapsed
+            y[clients] = legs["y"][rows] + legs["vel_y"][rows] * elapsed
+        out_of_bounds = np.zeros(len(self), dtype=bool)
+        if self.env.boundaries:
+            (x_lower, x_upper, y_lower, y_upper) = self.env.boundaries
+            out_of_bounds = moving & ~((x_lower < x) & (x < x_upper) & (y_lower < y) & (y < y_upper))
+        self.timestamp, self.x, self.y = now, x, y
+        return x, y, out_of_bounds
+
+    def get_positions(self, indices, now):
+        """Positions of many clients, evaluated for all clients at once
+
+        Args:
+            indices (list): Indices of the clients
+            now (float): Current simulation time
+
+        Returns:
+            ndarray: x coordinates of the clients
+            ndarray: y coordinates of the clients
+        """
+        if now != self.timestamp or self.legs is None:
+            self.evaluate(now)
+        indices = np.asarray(indices, dtype=np.int64)
+        return self.x[indices], self.y[indices]
@@ -9,10 +9,13 @@ import math
 import time
 from random import Random
 import numpy as np
+from collections import deque, OrderedDict
+from .gossip import GossipTable
+from .slot_manager import SlotManager
 
 
 class FogNode(object):
-    def __init__(self, env, id, discovery_protocol, slots, hardware=2, phy_x=4632239.86, phy_y=5826584.42, verbose=True):
+    def __init__(self, env, id, discovery_protocol, slots, hardware=2, phy_x=4632239.86, phy_y=5826584.42, verbose=True, history_window=100):
         """Fog Node of the simulation
 
         Args:
@@ -24,33 +27,40 @@ class FogNode(object):
             phy_x (float, optional): Physical x-coordinate of the Fog Node. Defaults to 4632239.86.
             phy_y (float, optional): Physical y-coordinate of the Fog Node. Defaults to 5826584.42.
             verbose (bool, optional): Verbosity of the Fog Node. Defaults to True.
+            history_window (int, optional): Amount of recent messages kept in the in and out history, all messages are kept in the message log of the environment. Defaults to 100.
         """
         self.env = env
         self.id = id
         self.discovery_protocol = discovery_protocol
         self.slots = max(1, slots)
         self.hardware = hardware
-        self.clients = []  # {'id', 'timestamp'}
+        # Connected clients, idle clients are evicted after 2 seconds
+        self.clients = SlotManager(env, self, self.slots)
         self.msg_pipe = simpy.Store(env)
         self.phy_x = phy_x
         self.phy_y = phy_y
-        self.in_msg_history = []
-        self.out_msg_history = []
+        # (ID, distance) of the nearest cell tower, set once by the FogEnvironment
+        self.nearest_celltower = None
+        # Only recent windows are kept, all messages are in the message log of the environment
+        self.in_msg_history = deque(maxlen=history_window)
+        self.out_msg_history = deque(maxlen=history_window)
         self.verbose = verbose
         self.virtual_position = self.init_virtual_position(discovery_protocol)
-        # List of all the node of the targets ring with their answers
-        self.meridian_requests = []
-        # List of all targets the node is currently pinging
-        self.meridian_pings = []
-        self.gossip = [{"id": self.id, "position": self.virtual_position,
-                        "timestamp": env.now, "type": type(self).__name__, "available_slots": self.slots}]
+        # (target ID, request ID) -> answers of the ring members to a running closest node search
+        self.meridian_requests = {}
+        # (target ID, ping message ID) -> requester of a ping the node sent to the target, ordered by sending time
+        self.meridian_pings = OrderedDict()
+        # Sender ID -> (timestamp, latency) of the last ping received from the sender, ordered by receiving time
+        self.last_pings = OrderedDict()
+        # Versioned gossip, only the changes since the last exchange are sent to a peer
+        self.gossip = GossipTable(self.id, {"position": self.virtual_position, "timestamp": env.now,
+                                            "type": type(self).__name__, "available_slots": self.slots})
 
         # Performance measures
         self.probe_performance = np.nan
         self.connect_performance = np.nan
         self.discovery_performance = np.nan
         self.await_performance = np.nan
-        self.workload = []
 
         # Start the processes
         if(discovery_protocol == "vivaldi" or discovery_protocol == "baseline" or discovery_protocol == "random"):
@@ -59,8 +69,8 @@ class FogNode(object):
             self.connect_process = env.process(self.meridian_connect())
             self.ring_management = env.process(
                 self.meridian_ring_management(10))
+            env.register_tick(self.expire_meridian_pings)
         self.probe_network_process = env.process(self.probe_network())
-        self.monitor_process = env.process(self.monitor())
         if self.verbose:
             print("Fog Node {} active at x:{}, y: {}".format(
                 self.id, self.phy_x, self.phy_y))
@@ -78,6 +88,7 @@ class FogNode(object):
         while True:
             in_msg = yield self.msg_pipe.get()
             self.in_msg_history.append(in_msg)
+            self.env.receive_message(in_msg)
 
             if self.verbose:
                 print("Node {}: {}".format(self.id, in_msg))
@@ -86,22 +97,13 @@ class FogNode(object):
 
             # Message type 1 = Regular Message from client
             if(in_msg.msg_type == 1):
-                # check if client is a current client
-                current_client = next(
-                    (client for client in self.clients if client.get('id') == in_msg.send_id), None)
-                # Update if client is already registered
-                if current_client:
-                    current_client.update({'timestamp': self.env.now})
-                # Append to list if client is not already registered
-                elif len(self.clients) < self.slots:
-                    self.clients.append(
-                        {'id': in_msg.send_id, 'timestamp': self.env.now})
+                # Refresh the client or connect it if it is not already registered
                 # if we have no capacity for the client we simply do not answer
-                else:
+                if not self.clients.refresh(in_msg.send_id):
                     continue
                 
                 out_msg = self.env.send_message(
-                    self.id, in_msg.send_id, "Reply from node", gossip=self.gossip, response=True, msg_type=1, prev_msg=in_msg)
+                    self.id, in_msg.send_id, "Reply from node", gossip=self.share_gossip(in_msg.send_id), response=True, msg_type=1, prev_msg=in_msg)
                 self.out_msg_history.append(out_msg)
 
             # Message type 2 = Node Request -> Trigger search for closest node
@@ -117,7 +119,7 @@ class FogNode(object):
                 # If it is a request we simply answer
                 else:
                     out_msg = self.env.send_message(
-                        self.id, in_msg.send_id, "Probe reply from Node", gossip=self.gossip, response=True, prev_msg=in_msg, msg_type=3)
+                        self.id, in_msg.send_id, "Probe reply from Node", gossip=self.share_gossip(in_msg.send_id), response=True, prev_msg=in_msg, msg_type=3)
                     self.out_msg_history.append(out_msg)
 
             # unknown message type
@@ -157,7 +159,7 @@ class FogNode(object):
         client_id = in_msg.send_id
         start = time.perf_counter()
         msg = self.env.send_message(self.id, client_id,
-                                    closest_node_id, gossip=self.gossip, msg_type=2, response=True, prev_msg=in_msg)
+                                    closest_node_id, gossip=self.share_gossip(client_id), msg_type=2, response=True, prev_msg=in_msg)
         self.out_msg_history.append(msg)
         self.discovery_performance = time.perf_counter() - start
 
@@ -176,6 +178,7 @@ class FogNode(object):
             in_msg = yield self.msg_pipe.get()
             start = time.perf_counter()
             self.in_msg_history.append(in_msg)
+            self.env.receive_message(in_msg)
 
             if(in_msg.send_id == self.id):
                 print("I received a message from myself: ", in_msg)
@@ -192,21 +195,12 @@ class FogNode(object):
 
             # Message type 1 = Regular Message from client
             if(in_msg.msg_type == 1):
-                # check if client is a current client
-                current_client = next(
-                    (client for client in self.clients if client.get('id') == in_msg.send_id), None)
-                # Update if client is already registered
-                if current_client:
-                    current_client.update({'timestamp': self.env.now})
-                # Append to list if client is not already registered
-                elif len(self.clients) < self.slots:
-                    self.clients.append(
-                        {'id': in_msg.send_id, 'timestamp': self.env.now})
+                # Refresh the client or connect it if it is not already registered
                 # if we have no capacity for the client we simply do not answer
-                else:
+                if not self.clients.refresh(in_msg.send_id):
                     continue
                 out_msg = self.env.send_message(
-                    self.id, in_msg.send_id, "Reply from node", gossip=self.gossip, response=True, prev_msg=in_msg, msg_type=1)
+                    self.id, in_msg.send_id, "Reply from node", gossip=self.share_gossip(in_msg.send_id), response=True, prev_msg=in_msg, msg_type=1)
                 self.out_msg_history.append(out_msg)
 
             # Message type 2 = Node Request -> Trigger search for closest node
@@ -215,24 +209,27 @@ class FogNode(object):
 
             # Message type 3 = Network Probing -> update VivaldiPosition at response or respond at Request
             elif(in_msg.msg_type == 3):
+                # Remember the latest ping of the sender, a forwarded closest node search starts from it
+                self.last_pings[in_msg.send_id] = (self.env.now, in_msg.latency)
+                self.last_pings.move_to_end(in_msg.send_id)
                 # If it is an incoming ping from a Fog Node, just reply
-                if(isinstance(sender, FogNode) and not in_msg.prev_msg):
+                if(isinstance(sender, FogNode) and in_msg.prev_msg_id is None):
                     out_msg = self.env.send_message(
-                        self.id, in_msg.send_id, "Probe reply from Node", gossip=self.gossip, response=True, prev_msg=in_msg, msg_type=3)
+                        self.id, in_msg.send_id, "Probe reply from Node", gossip=self.share_gossip(in_msg.send_id), response=True, prev_msg=in_msg, msg_type=3)
                     self.out_msg_history.append(out_msg)
 
                 # If it is an outgoing ping from Client look up the requester and forward the latency to the requester
+                # The ping information is removed as it is no longer needed, it is missing if the ping already expired
                 elif(isinstance(sender, MobileClient)):
-                    meridian_ping = next((ping for ping in self.meridian_pings if ping.get(
-                        'target') == in_msg.send_id), None)
-                    requester = meridian_ping.get('requester')
-                    msg_body = {'latency': in_msg.latency,
-                                'target': in_msg.send_id}
-                    out_msg = self.env.send_message(
-                        self.id, requester, msg=msg_body, gossip=self.gossip, response=True, prev_msg=meridian_ping.get('msg'), msg_type=4)
-                    self.out_msg_history.append(out_msg)
-                    # Remove the ping information as it is no longer needed
-                    self.meridian_pings.remove(meridian_ping)
+                    meridian_ping = self.meridian_pings.pop(
+                        (in_msg.send_id, in_msg.prev_msg_id), None)
+                    if meridian_ping:
+                        requester = meridian_ping.get('requester')
+                        msg_body = {'latency': in_msg.latency,
+                                    'target': in_msg.send_id, 'request': meridian_ping.get('request')}
+                        out_msg = self.env.send_message(
+                            self.id, requester, msg=msg_body, gossip=self.share_gossip(requester), response=True, prev_msg=meridian_ping.get('msg_id'), msg_type=4)
+                        self.out_msg_history.append(out_msg)
 
             # Ping Request from other node, to ping the target
             elif(in_msg.msg_type == 4):
@@ -240,22 +237,22 @@ class FogNode(object):
                 if(in_msg.response):
                     target = in_msg.body.get('target')
                     d_latency = in_msg.body.get('latency')
-                    request = next((request for request in self.meridian_requests if request.get(
-                        'target') == target), None)
+                    request = self.meridian_requests.get(
+                        (target, in_msg.body.get('request')))
                     if request:
                         request.get('measures').append(
                             {'latency': d_latency, 'member': in_msg.send_id})
 
                 # Only take part in the probing process to a client if node still has the resscource for it
                 # By doing this we ensure no more clients are forwarded to this node
-                elif len(self.clients) < self.slots:
-                    # Append ping information to short memory
+                elif self.clients.free_slots > 0:
                     target = in_msg.body.get('target')
-                    self.meridian_pings.append(
-                        {'msg_id': in_msg.id, 'requester': in_msg.send_id, 'target': target})
                     out_msg = self.env.send_message(
-                        self.id, in_msg.body.get('target'), msg="Ping from Node", gossip=self.gossip, msg_type=3)
+                        self.id, target, msg="Ping from Node", gossip=self.share_gossip(target), msg_type=3)
                     self.out_msg_history.append(out_msg)
+                    # Append ping information to short memory, the reply of the target refers to the ping message
+                    self.meridian_pings[(target, out_msg.id)] = {
+                        'msg_id': in_msg.id, 'requester': in_msg.send_id, 'request': in_msg.body.get('request'), 'timestamp': self.env.now}
 
             else:
                 if self.verbose:
@@ -275,15 +272,12 @@ class FogNode(object):
         # If sender of the Message is another node we iniatiate the search process with the targets last ping
         if(isinstance(sender, FogNode)):
             target = in_msg.body
-            # reversing in_msg_history to automatically find the newest ping
-            rev_msg_history = reversed(self.in_msg_history)
-            ping_from_target = next(
-                (message for message in rev_msg_history if message.send_id == target and message.msg_type == 3), None)
-            orig_msg = in_msg.prev_msg
+            last_ping = self.last_pings.get(target)
+            orig_msg = in_msg.prev_msg_id
             # If there is no ping from the target something logically went wrong and we return
-            if not ping_from_target:
+            if not last_ping:
                 return
-            target_latency = ping_from_target.latency
+            target_latency = last_ping[1]
 
         # If the sender of the message is a client, the target is the sender
         if(isinstance(sender, MobileClient)):
@@ -296,26 +290,28 @@ class FogNode(object):
         ring_number = ring_set.get_ring_number(target_latency)
         ring = ring_set.get_ring(True, ring_number)
         # Message every member of the same ring as the client with a type 4 message: Ping request to target
-        for member in ring.get('members'):
-            if(member.get('id') != self.id):
-                msg = self.env.send_message(self.id, member.get('id'),
-                                      {'latency': target_latency, 'target': target}, gossip=self.gossip, msg_type=4)
-                self.out_msg_history.append(msg)
+        members = [member.get('id') for member in ring.get(
+            'members') if member.get('id') != self.id]
+        # The closest node request identifies the search, so searches for the same target do not collide
+        msgs = self.env.multicast_message(self.id, members,
+                                          {'latency': target_latency, 'target': target, 'request': in_msg.id}, gossips=[self.share_gossip(member) for member in members], msg_type=4)
+        self.out_msg_history.extend(msgs)
         # Start meridian waiting process to collect answers
-        self.meridian_requests.append({'target': target, 'measures': []})
+        self.meridian_requests[(target, in_msg.id)] = {'measures': []}
         self.env.process(self.await_meridian_pings(
-            target, in_msg.latency, orig_msg))
+            target, in_msg.id, in_msg.latency, orig_msg))
         self.discovery_performance = time.perf_counter() - start
 
-    def await_meridian_pings(self, target, d_latency, orig_msg):
+    def await_meridian_pings(self, target, request_id, d_latency, orig_msg):
         """The node has issued other nodes to ping the target.
         Like elaborated in the meridian paper we wait (2*beta + 1)*d timesteps until we forward the best node to the target
         Nodes with no slots available simply do not answer and therefore are ignored in this process
 
         Args:
             target (target_id): ID of the target, usually a client
+            request_id (int): ID of the closest node request which started the search
             d_latency (float): latency to the target
-            orig_msg (Message): original message from the closest node request
+            orig_msg (Message|int): original message from the closest node request or its ID
 
         Yields:
             simpy.events.timeout: Waiting the given time
@@ -323,21 +319,31 @@ class FogNode(object):
         waiting_time = (2*self.virtual_position.beta + 1)*d_latency
         yield self.env.timeout((waiting_time))
         start = time.perf_counter()
-        requests = next(
-            (req for req in self.meridian_requests if req.get('target') == target), None)
+        # The search is finished, so the answers are removed
+        requests = self.meridian_requests.pop((target, request_id))
         if(requests.get('measures')):
             measures = requests.get('measures')
             best_node = min(measures, key=lambda x: x['latency'])
             best_node_id = best_node.get('member')
             msg = self.env.send_message(
-                self.id, best_node_id, msg=target, gossip=self.gossip, msg_type=2, prev_msg=orig_msg)
+                self.id, best_node_id, msg=target, gossip=self.share_gossip(best_node_id), msg_type=2, prev_msg=orig_msg)
         else:
             msg = self.env.send_message(self.id, target,
-                                        self.id, gossip=self.gossip, response=True, msg_type=2, prev_msg=orig_msg)
+                                        self.id, gossip=self.share_gossip(target), response=True, msg_type=2, prev_msg=orig_msg)
         self.out_msg_history.append(msg)
-        self.meridian_requests.remove(requests)
         self.await_performance = time.perf_counter() - start
 
+    def expire_meridian_pings(self):
+        """Removes the pings the target never answered and the last pings of senders which are silent for too long
+        Both expire after the meridian ping timeout of the environment, the closest node searches are removed by their waiting process
+        Is called by the environment every simulated second
+        """
+        expiry_time = self.env.now - self.env.meridian_ping_timeout
+        while self.meridian_pings and next(iter(self.meridian_pings.values())).get('timestamp') < expiry_time:
+            self.meridian_pings.popitem(last=False)
+        while self.last_pings and next(iter(self.last_pings.values()))[0] < expiry_time:
+            self.last_pings.popitem(last=False)
+
     def meridian_ring_management(self, period=30):
         """Meridian ring management process
         Assigns ring membership periodically
@@ -358,16 +364,17 @@ class FogNode(object):
         Yields:
             simpy.Event.timeout: timeout event which decides the probing interval
         """
-        my_random = Random(self.id)
+        # Seeded by the external ID like before the dense IDs, Random hashed UUID seeds itself before Python 3.11
+        external_id = self.env.get_external_id(self.id)
+        my_random = Random(external_id if isinstance(external_id, (int, float, str, bytes)) else hash(external_id))
         yield self.env.timeout(my_random.randint(1,1000)/1000)
         # Initially probe every node in the network once. Is needed for meridian and cannot harm other protocols either
-        for node in self.env.nodes:
-            probe_node = node.get('id')
-            # We dont want to send messages to ourself
-            if probe_node != self.id:
-                out_msg = self.env.send_message(
-                    self.id, probe_node, "Probing network at start", gossip=self.gossip, response=False, msg_type=3)
-                self.out_msg_history.append(out_msg)
+        # We dont want to send messages to ourself
+        probe_nodes = [node.get('id')
+                       for node in self.env.nodes if node.get('id') != self.id]
+        out_msgs = self.env.multicast_message(
+            self.id, probe_nodes, "Probing network at start", gossips=[self.share_gossip(probe_node) for probe_node in probe_nodes], response=False, msg_type=3)
+        self.out_msg_history.extend(out_msgs)
 
         self.neighbours = self.env.get_neighbours(self)
         while(True):
@@ -380,7 +387,7 @@ class FogNode(object):
             else:
                 probe_node = random.choice(self.neighbours)["id"]
             out_msg = self.env.send_message(
-                self.id, probe_node, "Probing network", gossip=self.gossip, response=False, msg_type=3)
+                self.id, probe_node, "Probing network", gossip=self.share_gossip(probe_node), response=False, msg_type=3)
             self.out_msg_history.append(out_msg)
             # unnecessary complex timeout for the probing process
             # idea is the longer the newtork is established the less probes are necessary
@@ -389,20 +396,6 @@ class FogNode(object):
                 self.env.now + 1) if math.log(self.env.now + 1) < 2 else 2
             yield self.env.timeout(timeout + my_random.random())
 
-    def monitor(self):
-        """Monitor process of the Fog Node
-        Manages the available slots and tracks metrics
-        """
-        while True:
-            # check every second if a client connection is outdated
-            for client in self.clients:
-                if self.env.now - client.get('timestamp') > 2:
-                    self.clients.remove(client)
-                
-            # append current workload to list
-            self.workload.append({'timestamp': np.ceil(self.env.now), 'clients': len(self.clients), 'workload': len(self.clients)/self.slots})
-            yield self.env.timeout(1)
-            
     def get_coordinates(self):
         """Returns the physical coordinates of the node
 
@@ -431,44 +424,50 @@ class FogNode(object):
         return min(1, max(sla, 1 - (1-sla)* (len(self.clients)/(self.slots))))
 
     def calculate_rtt(self, in_msg):
-        """Calculates the round-trip-time (rtt) of the incoming message by comparing timestamps with the out message
+        """Returns the round-trip-time (rtt) of the incoming message
+        The rtt is resolved from the pending requests of the environment when the message is received
 
         Args:
-            in_msg (dict): Incoming message
+            in_msg (Message): Incoming message
 
         Returns:
             float: roundtrip time of the message
         """
-        out_msg = next(
-            (message for message in self.out_msg_history if message.id == in_msg.prev_msg.id), None)
-        rtt = self.env.now - out_msg.timestamp
+        rtt = in_msg.rtt
+        # The request already expired before the response arrived
+        if rtt is None:
+            rtt = self.env.now - self.env.message_log.get_timestamp(in_msg.prev_msg_id)
         return rtt
 
+    def share_gossip(self, rec_id):
+        """Returns the gossip for a message to the given recipient
+        The own news is brought up to date first, only the entries changed since the last message to the recipient are shared
+
+        Args:
+            rec_id (int): ID of the recipient
+
+        Returns:
+            tuple: The changed gossip entries including the own news
+        """
+        self.gossip.update_own(self.env.now, position=self.get_virtual_position(),
+                               available_slots=self.clients.free_slots)
+        return self.gossip.delta(rec_id)
+
     def update_gossip(self, in_msg):
         """Updates the own gossip with the gossip from the in message
+        Only entries with a newer version than the own entry are taken over, unknown entries only if they are in the gossip scope
 
         Args:
-            in_msg (list[dict]): An incoming message from another participant
+            in_msg (Message): An incoming message from another participant
         """
-        in_gossip = in_msg.gossip
-        for news in in_gossip:
-            # If the news is not in own gossip add it
-            if not any(entry.get("id") == news.get("id") for entry in self.gossip):
-                self.gossip.append(news)
-            # Otherwise update existing news
-            else:
-                own_news = next(
-                    (entry for entry in self.gossip if entry["id"] == news["id"]), None)
-                # keep own gossip up to date
-                if news.get("id") == self.id:
-                    own_news.update(
-                        {"position": self.get_virtual_position(), "timestamp": self.env.now, "available_slots": self.slots - len(self.clients)})
-                # Update news if it is older than incoming news
-                elif own_news.get("timestamp") < news.get("timestamp"):
-                    own_news.update(
-                        {"position": news.get("position"), "timestamp": news.get("timestamp"), "available_slots": news.get("available_slots")})
-                    if(self.discovery_protocol == "meridian" and news.get('type') == FogNode):
-                        self.virtual_position.update_meridian(news)
+        scope = self.env.gossip_scope
+        accepts = None if scope.scope == "all" else (lambda news: scope.accepts(self, news))
+        for news in self.gossip.merge(in_msg.gossip, accepts=accepts):
+            # The type of the news is a class name, so comparing it with the class is never true and update_meridian is not run
+            # Comparing with type(self).__name__ would enable the gossip driven ring updates of Meridian, which changes its results
+            if(self.discovery_protocol == "meridian" and news.get('type') == FogNode):
+                self.virtual_position.update_meridian(news)
+        scope.prune(self)
 
     def init_virtual_position(self, discovery_protocol):
         """Inits the virtual position depending on the discovery protocol
@@ -0,0 +1,152 @@
+from random import Random
+import numpy as np
+
+
+class Oracle(object):
+    MODES = ("eager", "deferred", "off")
+
+    def __init__(self, env, mode="eager", sample_rate=1.0, seed=0):
+        """Computes the theoretically optimal connection of client messages for the metrics
+        eager: the optimum is calculated when the message is built
+        deferred: the client position is recorded when the message is built and all optima are calculated in one vectorized batch on flush
+        off: no optima are calculated, the optimal error metrics stay empty
+
+        The optimum depends on the free slots and bandwidth of the Fog Nodes, so a deferred oracle records the load of the nodes with its pending messages
+        The environment has to call load_changed whenever the clients of a Fog Node change, a new load is only copied once the next message is deferred
+
+        Optionally only a random sample of the requests is evaluated, responses are evaluated if their request is part of the sample
+        The sampler has its own seeded random stream, so the sample is reproducible and does not change the simulation
+
+        Args:
+            env (FogEnvironment): Fog Environment of the simulation
+            mode (str, optional): Either eager, deferred or off. Defaults to "eager".
+            sample_rate (float, optional): Share of requests the optimum is calculated for, between (0, 1]. Defaults to 1.0.
+            seed (int, optional): Seed of the sampler. Defaults to 0.
+
+        Raises:
+            ValueError: If the mode is unknown or the sample rate is not between (0, 1]
+        """
+        if mode not in self.MODES:
+            raise ValueError(
+                "Unknown oracle mode. Expected one of {}, found {}".format(list(self.MODES), mode))
+        if not 0 < sample_rate <= 1:
+            raise ValueError(
+                "Oracle sample rate has to be between (0, 1], found {}".format(sample_rate))
+        self.env = env
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.sampler = Random(seed)
+        # Pending requests: message ID, client coordinates and load at sending time
+        self.request_ids = []
+        self.request_x = []
+        self.request_y = []
+        self.request_loads = []
+        # Pending responses: message ID, request ID, client coordinates and load, optimal node is inherited from the request
+        self.response_ids = []
+        self.response_prev_ids = []
+        self.response_x = []
+        self.response_y = []
+        self.response_loads = []
+        # Loads of the Fog Nodes referenced by the pending messages: client count and bandwidth per node, the last entry is the current load
+        self.loads = []
+        self.load_valid = False
+
+    def is_sampled(self, message):
+        """Draws whether the optimum of a request is calculated
+        Responses are not drawn, they inherit the optimal node of their request, which is None for requests outside the sample
+
+        Args:
+            message (Message): Request of a client
+
+        Returns:
+            boolean: Whether the request is part of the sample
+        """
+        if self.sample_rate >= 1:
+            return True
+        return self.sampler.random() < self.sample_rate
+
+    def load_changed(self):
+        """Marks the recorded load of the Fog Nodes as outdated, has to be called whenever the clients of a Fog Node change
+        """
+        self.load_valid = False
+
+    def record_load(self):
+        """Copies the current load of the Fog Nodes if it changed since the last copy
+
+        Returns:
+            int: Index of the current load in self.loads
+        """
+        if not self.load_valid:
+            env = self.env
+            if env.latency_engine is None:
+                env.build_latency_engine()
+            self.loads.append((env.latency_engine.clients.copy(), env.latency_engine.bandwidth.copy()))
+            self.load_valid = True
+        return len(self.loads) - 1
+
+    def defer(self, message):
+        """Records the state needed to calculate the optimum of a client message later
+
+        Args:
+            message (Message): Message between a client and a Fog Node
+        """
+        client_id = message.rec_id if message.response else message.send_id
+        x, y = self.env.get_participant(client_id).get_coordinates()
+        load = self.record_load()
+        if message.response:
+            self.response_ids.append(message.id)
+            self.response_prev_ids.append(message.prev_msg_id)
+            self.response_x.append(x)
+            self.response_y.append(y)
+            self.response_loads.append(load)
+        else:
+            self.request_ids.append(message.id)
+            self.request_x.append(x)
+            self.request_y.append(y)
+            self.request_loads.append(load)
+
+    def flush(self):
+        """Calculates the optima of all pending messages and writes them into the message log
+        Messages are resolved in one vectorized batch per recorded load, requests before responses, as responses inherit the optimal node of their request
+        """
+        if not self.request_ids and not self.response_ids:
+            return
+        env = self.env
+        if env.latency_engine is None:
+            env.build_latency_engine()
+        engine = env.latency_engine
+        log = env.message_log
+
+        if self.request_ids:
+            _, distances = env.get_nearest_celltowers(self.request_x, self.request_y)
+            request_loads = np.array(self.request_loads)
+            for load, (clients, bandwidth) in enumerate(self.loads):
+                rows = np.flatnonzero(request_loads == load)
+                if len(rows) == 0:
+                    continue
+                latencies = engine.clients_to_nodes(distances[rows], bandwidth=bandwidth)
+                opt_nodes = engine.pick_closest(latencies, clients=clients)
+                for row, (request, opt_node) in enumerate(zip(rows, opt_nodes)):
+                    # There is no optimal node if all slots are taken
+                    if opt_node is not None:
+                        log.set_optimals(self.request_ids[request], opt_node, float(
+                            latencies[row, engine.node_index[opt_node]]))
+
+        if self.response_ids:
+            _, distances = env.get_nearest_celltowers(self.response_x, self.response_y)
+            response_loads = np.array(self.response_loads)
+            for load, (clients, bandwidth) in enumerate(self.loads):
+                rows = np.flatnonzero(response_loads == load)
+                if len(rows) == 0:
+                    continue
+                latencies = engine.clients_to_nodes(distances[rows], bandwidth=bandwidth)
+                for row, response in enumerate(rows):
+                    opt_node = log.get_opt_node(self.response_prev_ids[response])
+                    if opt_node is not None:
+                        log.set_optimals(self.response_ids[response], opt_node, float(
+                            latencies[row, engine.node_index[opt_node]]))
+
+        self.request_ids, self.request_x, self.request_y, self.request_loads = [], [], [], []
+        self.response_ids, self.response_prev_ids, self.response_x, self.response_y, self.response_loads = [], [], [], [], []
+        self.loads = []
+        self.load_valid = False
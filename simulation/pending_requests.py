@@ -0,0 +1,74 @@
+from collections import OrderedDict
+
+
+class PendingRequests(object):
+    def __init__(self, timeout=10):
+        """Table of all requests which are still waiting for a response, keyed by message ID
+        A request is every message which is neither a response nor refers to a previous message
+        Entries are removed when the response arrives or when they expire, expired requests are counted as lost per sender
+
+        Args:
+            timeout (float, optional): Seconds until an unanswered request expires. Defaults to 10.
+        """
+        self.timeout = timeout
+        # Message ID -> (sender ID, send timestamp), ordered by send timestamp
+        self.requests = OrderedDict()
+        # Sender ID -> amount of expired requests
+        self.expired = {}
+        self.answered = 0
+
+    def __len__(self):
+        return len(self.requests)
+
+    def add(self, message):
+        """Registers a sent request
+
+        Args:
+            message (Message): The request
+        """
+        self.requests[message.id] = (message.send_id, message.timestamp)
+
+    def resolve(self, msg_id, now):
+        """Removes an answered request and calculates its round-trip-time
+
+        Args:
+            msg_id (int): ID of the request
+            now (float): Current simulation time
+
+        Returns:
+            float: Round-trip-time of the request or None if the request is unknown or already expired
+        """
+        request = self.requests.pop(msg_id, None)
+        if request is None:
+            return None
+        self.answered += 1
+        return now - request[1]
+
+    def expire(self, now):
+        """Removes all requests older than the timeout and counts them as lost
+
+        Args:
+            now (float): Current simulation time
+        """
+        while self.requests:
+            msg_id, (send_id, timestamp) = next(iter(self.requests.items()))
+            if now - timestamp <= self.timeout:
+                break
+            del self.requests[msg_id]
+            self.expired[send_id] = self.expired.get(send_id, 0) + 1
+
+    def get_lost(self, now):
+        """Amount of lost requests per sender, the expired ones and the pending ones older than the timeout
+        Pending requests within the timeout could still be answered, so they are not counted
+
+        Args:
+            now (float): Current simulation time
+
+        Returns:
+            dict: Sender ID -> amount of lost requests
+        """
+        lost = dict(self.expired)
+        for send_id, timestamp in self.requests.values():
+            if now - timestamp > self.timeout:
+                lost[send_id] = lost.get(send_id, 0) + 1
+        return lost
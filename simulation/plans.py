@@ -0,0 +1,192 @@
+import xml.etree.ElementTree as et
+import numpy as np
+
+
+def parse_trav_time(trav_time):
+    """Converts a travel time of the plans XML into seconds
+
+    Args:
+        trav_time (str): Travel time as HH:MM:SS
+
+    Returns:
+        int: Travel time in seconds
+    """
+    return sum(factor * int(t) for factor, t in zip([3600, 60, 1], trav_time.split(":")))
+
+
+def read_person(person):
+    """Reads the trips of a person element of the plans XML
+
+    Args:
+        person (XML object): Person element with its trip elements
+
+    Returns:
+        tuple: ID of the person, x coordinates, y coordinates and travel times in seconds of the trips
+    """
+    trips = person.findall('trip')
+    return (person.get('id'), [float(trip.attrib['x']) for trip in trips],
+            [float(trip.attrib['y']) for trip in trips],
+            [parse_trav_time(trip.attrib['trav_time']) for trip in trips])
+
+
+class TripPlans(object):
+    def __init__(self, ids, x, y, durations, offsets):
+        """Trip plans of many clients compiled into flat arrays
+        The trips of all clients are stored back to back, the trips of the i-th plan are the rows offsets[i] to offsets[i + 1]
+        Plans are compiled once at load time, so the XML document can be freed before the simulation starts
+
+        Args:
+            ids (list): ID of every plan from the plans XML
+            x (ndarray): x coordinate of every trip in GK4/EPSG:31468 as float64
+            y (ndarray): y coordinate of every trip in GK4/EPSG:31468 as float64
+            durations (ndarray): Travel time of every trip in seconds as int32
+            offsets (ndarray): Row of the first trip of every plan and the total amount of trips as int64
+        """
+        self.ids = ids
+        self.x = x
+        self.y = y
+        self.durations = durations
+        self.offsets = offsets
+
+    @classmethod
+    def from_persons(cls, persons):
+        """Compiles the person elements of the plans XML, persons without trips are dropped
+
+        Args:
+            persons (list): XML person elements of the open berlin scenario
+
+        Returns:
+            TripPlans: The compiled plans
+        """
+        return cls.from_trips([read_person(person) for person in persons if person.find('trip') is not None])
+
+    @classmethod
+    def from_file(cls, path, bounds=None, max_clients=None, sampler=None):
+        """Streams the plans XML and compiles the selected persons without building the whole document
+        Only persons starting within the bounds are taken, if max_clients is given a uniform sample is drawn while reading (reservoir sampling)
+        Processed elements are cleared right away, so the memory only holds the compiled trips of the selected persons
+
+        Args:
+            path (str|Path): Path of the plans XML
+            bounds (tuple, optional): x_lower, x_upper, y_lower, y_upper of the area the plans have to start in, all plans are taken if None. Defaults to None.
+            max_clients (int, optional): Amount of plans to be sampled, all plans are taken if None. Defaults to None.
+            sampler (Random, optional): Random instance of the sample, has to be given with max_clients. Defaults to None.
+
+        Returns:
+            TripPlans: The compiled plans, sampled plans are ordered by their slot in the reservoir
+        """
+        # Keep in line with sample, so cached and streamed plans select the same persons
+        selected = []
+        # Amount of persons within the bounds read so far
+        candidates = 0
+        root = None
+        for event, element in et.iterparse(path, events=("start", "end")):
+            if root is None:
+                root = element
+            if event != "end" or element.tag != "person":
+                continue
+            start = element.find('trip')
+            if start is not None:
+                x, y = float(start.attrib['x']), float(start.attrib['y'])
+                if bounds is None or (bounds[0] < x < bounds[1] and bounds[2] < y < bounds[3]):
+                    candidates += 1
+                    if max_clients is None or len(selected) < max_clients:
+                        selected.append(read_person(element))
+                    else:
+                        # Replaces a sampled person with probability max_clients / candidates
+                        slot = sampler.randrange(candidates)
+                        if slot < max_clients:
+                            selected[slot] = read_person(element)
+            # The person is compiled, so neither the person nor its trips are needed anymore
+            element.clear()
+            root.clear()
+        return cls.from_trips(selected)
+
+    @classmethod
+    def from_trips(cls, plans):
+        """Builds the flat arrays from the trips of single plans
+
+        Args:
+            plans (list): ID, x coordinates, y coordinates and travel times of every plan, as returned by read_person
+
+        Returns:
+            TripPlans: The compiled plans
+        """
+        offsets = np.zeros(len(plans) + 1, dtype=np.int64)
+        np.cumsum([len(plan[1]) for plan in plans], out=offsets[1:])
+        return cls([plan[0] for plan in plans],
+                   np.fromiter((x for plan in plans for x in plan[1]), dtype=np.float64, count=offsets[-1]),
+                   np.fromiter((y for plan in plans for y in plan[2]), dtype=np.float64, count=offsets[-1]),
+                   np.fromiter((d for plan in plans for d in plan[3]), dtype=np.int32, count=offsets[-1]),
+                   offsets)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_trips(self, index):
+        """Trips of a single plan
+
+        Args:
+            index (int): Index of the plan
+
+        Returns:
+            ndarray: x coordinates of the trips
+            ndarray: y coordinates of the trips
+            ndarray: Travel times of the trips in seconds
+        """
+        first, last = self.offsets[index], self.offsets[index + 1]
+        return self.x[first:last], self.y[first:last], self.durations[first:last]
+
+    def get_id(self, index):
+        """ID of a plan from the plans XML
+
+        Args:
+            index (int): Index of the plan
+
+        Returns:
+            str: ID of the plan
+        """
+        return str(self.ids[index])
+
+    def sample(self, bounds=None, max_clients=None, sampler=None):
+        """Selects plans like from_file does while streaming, so the same persons are selected from already compiled plans
+
+        Args:
+            bounds (tuple, optional): x_lower, x_upper, y_lower, y_upper of the area the plans have to start in, all plans are taken if None. Defaults to None.
+            max_clients (int, optional): Amount of plans to be sampled, all plans are taken if None. Defaults to None.
+            sampler (Random, optional): Random instance of the sample, has to be given with max_clients. Defaults to None.
+
+        Returns:
+            TripPlans: The selected plans in new compact arrays
+        """
+        candidates = np.arange(len(self))
+        if bounds is not None:
+            start_x, start_y = self.x[self.offsets[:-1]], self.y[self.offsets[:-1]]
+            candidates = np.flatnonzero((bounds[0] < start_x) & (start_x < bounds[1]) &
+                                        (bounds[2] < start_y) & (start_y < bounds[3]))
+        if max_clients is None or len(candidates) <= max_clients:
+            return self.select(candidates)
+        selected = candidates[:max_clients].tolist()
+        for seen, candidate in enumerate(candidates[max_clients:].tolist(), max_clients + 1):
+            slot = sampler.randrange(seen)
+            if slot < max_clients:
+                selected[slot] = candidate
+        return self.select(selected)
+
+    def select(self, indices):
+        """Copies a subset of the plans into new compact arrays
+
+        Args:
+            indices (array-like): Indices of the selected plans in the new order
+
+        Returns:
+            TripPlans: The selected plans
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        counts = self.offsets[indices + 1] - self.offsets[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        # Row of every selected trip in the old arrays
+        rows = np.repeat(self.offsets[indices] - offsets[:-1], counts) + np.arange(offsets[-1])
+        return TripPlans([self.get_id(i) for i in indices], self.x[rows], self.y[rows],
+                         self.durations[rows], offsets)
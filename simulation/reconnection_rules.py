@@ -37,7 +37,7 @@ class ReconnectionRules(object):
         if(not last_in_msg):
             return True
         out_msg = next(
-            (message for message in out_history if message.id == last_in_msg.prev_msg.id), None)
+            (message for message in out_history if message.id == last_in_msg.prev_msg_id), None)
         # Message has not come back so RTT cannot be calculated
         if(not out_msg):
             return True
@@ -65,7 +65,7 @@ class ReconnectionRules(object):
         if not in_history:
             return True
         filtered_in_history = list(filter(lambda message: message.msg_type == 1, in_history))
-        has_response = any(last_out_msg.id == message.prev_msg.id for message in filtered_in_history)
+        has_response = any(last_out_msg.id == message.prev_msg_id for message in filtered_in_history)
 
         # If Out Message has been sent longer than threshold and no answer is received
         if self.env.now - last_out_msg.timestamp > threshold:
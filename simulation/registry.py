@@ -0,0 +1,103 @@
+class ParticipantRegistry(object):
+    def __init__(self):
+        """Registry of all participants in the simulation
+        Participants are identified by dense integer IDs inside the simulation, the external IDs (UUIDs or plan IDs) are only kept for the export of metrics
+        Keeps a lookup table by ID, the cached kind of every participant and separate views for nodes, clients and cell towers
+        The views keep the {"id", "obj"} layout of the former lists in FogEnvironment
+        """
+        # Integer ID -> external ID
+        self.external_ids = []
+        # Integer ID -> participant object
+        self.participants = []
+        # Integer ID -> class name of the participant, e.g. "FogNode"
+        self.kinds = []
+        self.nodes = []
+        self.clients = []
+        self.celltowers = []
+        self.views = {"FogNode": self.nodes,
+                      "MobileClient": self.clients,
+                      "Celltower": self.celltowers}
+
+    def create_id(self, external_id):
+        """Reserves the next dense integer ID for a participant
+
+        Args:
+            external_id (uuid|str): External ID of the participant, e.g. a UUID or the ID from the plans XML
+
+        Returns:
+            int: The integer ID to create the participant with
+        """
+        self.external_ids.append(external_id)
+        self.participants.append(None)
+        self.kinds.append(None)
+        return len(self.external_ids) - 1
+
+    def add(self, participant):
+        """Adds a participant to the registry and to the view of its kind
+
+        Args:
+            participant (FogNode|MobileClient|Celltower): The participant to be registered, its ID has to be created with create_id
+
+        Raises:
+            ValueError: If the kind of the participant is unknown or the ID is not reserved or already registered
+        """
+        kind = type(participant).__name__
+        if kind not in self.views:
+            raise ValueError(
+                "Unknown participant kind. Expected one of {}, found {}".format(list(self.views), kind))
+        if self.get_external_id(participant.id) is None:
+            raise ValueError(
+                "Participant ID {} was not created by the registry".format(participant.id))
+        if self.participants[participant.id] is not None:
+            raise ValueError(
+                "Participant {} is already registered".format(participant.id))
+        self.participants[participant.id] = participant
+        self.kinds[participant.id] = kind
+        self.views[kind].append({"id": participant.id, "obj": participant})
+
+    def is_valid(self, id_x):
+        """Checks whether the given ID is an integer ID created by the registry
+
+        Args:
+            id_x (int): ID of the participant
+
+        Returns:
+            boolean: Whether or not the ID is valid
+        """
+        return isinstance(id_x, int) and 0 <= id_x < len(self.external_ids)
+
+    def get(self, id_x):
+        """Returns the participant object for the given ID
+
+        Args:
+            id_x (int): ID of the participant
+
+        Returns:
+            object: The participant or None if the ID is unknown
+        """
+        return self.participants[id_x] if self.is_valid(id_x) else None
+
+    def get_kind(self, id_x):
+        """Returns the cached kind of the participant with the given ID
+
+        Args:
+            id_x (int): ID of the participant
+
+        Returns:
+            str: Class name of the participant or None if the ID is unknown
+        """
+        return self.kinds[id_x] if self.is_valid(id_x) else None
+
+    def get_external_id(self, id_x):
+        """Maps an integer ID back to the external ID of the participant
+
+        Args:
+            id_x (int): ID of the participant
+
+        Returns:
+            uuid|str: External ID or None if the ID is unknown
+        """
+        return self.external_ids[id_x] if self.is_valid(id_x) else None
+
+    def __len__(self):
+        return len(self.external_ids)
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+import geopandas as gpd
+from .plans import TripPlans
+
+
+class ScenarioCache(object):
+    def __init__(self, directory=None):
+        """Binary cache of the preprocessed scenario inputs, the client trips and the cell towers
+        Every entry is a folder of .npy files named after the source and the hash of its content, so changed inputs get a new entry
+        The content hash is remembered for the size and modification time of the source, so unchanged inputs are not hashed again
+        Cached entries are memory-mapped, only the rows used by the simulation are read from disk
+
+        Args:
+            directory (str|Path, optional): Folder of the cache, the inputs are parsed in every run if None. Defaults to None.
+        """
+        self.directory = Path(directory) if directory is not None else None
+
+    def get_sources(self, path):
+        """Source file together with its sidecar files, e.g. the .dbf and .shx of a shapefile
+
+        Args:
+            path (str|Path): Path of the source file
+
+        Returns:
+            list: Paths of the files sorted by name
+        """
+        path = Path(path)
+        return sorted(source for source in path.parent.glob(path.stem + ".*") if source.is_file())
+
+    def get_stat_key(self, path):
+        """Hashes the names, sizes and modification times of a source file and its sidecar files
+
+        Args:
+            path (str|Path): Path of the source file
+
+        Returns:
+            str: Hex digest of the file stats
+        """
+        digest = hashlib.sha256()
+        for source in self.get_sources(path):
+            stat = source.stat()
+            digest.update("{}:{}:{};".format(source.name, stat.st_size, stat.st_mtime_ns).encode())
+        return digest.hexdigest()
+
+    def get_key(self, path):
+        """Hashes the content of a source file together with its sidecar files
+
+        Args:
+            path (str|Path): Path of the source file
+
+        Returns:
+            str: Hex digest of the content
+        """
+        digest = hashlib.sha256()
+        for source in self.get_sources(path):
+            digest.update(source.name.encode())
+            with open(source, "rb") as source_file:
+                for chunk in iter(lambda: source_file.read(1 << 20), b""):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def lookup_key(self, name, path):
+        """Content hash of a source, only hashed if the size or modification time of the source is unknown to the cache
+        A source that was touched or copied without changing its content is hashed again and still finds its entry
+
+        Args:
+            name (str): Name of the cache entry
+            path (str|Path): Path of the source file
+
+        Returns:
+            str: Hex digest of the content
+        """
+        stat_file = self.directory.joinpath("{}-{}.key".format(name, self.get_stat_key(path)[:16]))
+        if stat_file.is_file():
+            return stat_file.read_text().strip()
+        key = self.get_key(path)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_file = stat_file.with_name("{}.tmp-{}".format(stat_file.name, os.getpid()))
+        tmp_file.write_text(key)
+        os.replace(tmp_file, stat_file)
+        return key
+
+    def load(self, name, path, build):
+        """Loads the arrays of a source from the cache or builds and stores them
+
+        Args:
+            name (str): Name of the cache entry
+            path (str|Path): Path of the source file
+            build (function): Builds a dict of array name -> ndarray from the source
+
+        Returns:
+            dict: Array name -> ndarray, memory-mapped if it was cached
+        """
+        if self.directory is None:
+            return build()
+        entry = self.directory.joinpath("{}-{}".format(name, self.lookup_key(name, path)[:16]))
+        if entry.is_dir():
+            return {array.stem: np.load(array, mmap_mode="r") for array in entry.glob("*.npy")}
+        arrays = build()
+        # Written to a temporary folder first, so parallel runs never see a partial entry
+        tmp_entry = entry.with_name("{}.tmp-{}".format(entry.name, os.getpid()))
+        tmp_entry.mkdir(parents=True)
+        for array_name, array in arrays.items():
+            np.save(tmp_entry.joinpath(array_name + ".npy"), array)
+        try:
+            tmp_entry.rename(entry)
+        except OSError:
+            # Another run stored the entry in the meantime
+            shutil.rmtree(tmp_entry)
+        return arrays
+
+    def load_plans(self, path, bounds=None, max_clients=None, sampler=None):
+        """Loads the trip plans of the persons starting within the bounds and samples max_clients of them
+        The cache holds the plans of all persons, without a cache the plans XML is streamed and filtered while reading
+        Both ways select the same persons
+
+        Args:
+            path (str|Path): Path of the plans XML
+            bounds (tuple, optional): x_lower, x_upper, y_lower, y_upper of the area the plans have to start in, all plans are taken if None. Defaults to None.
+            max_clients (int, optional): Amount of plans to be sampled, all plans are taken if None. Defaults to None.
+            sampler (Random, optional): Random instance of the sample, has to be given with max_clients. Defaults to None.
+
+        Returns:
+            TripPlans: The selected plans
+        """
+        if self.directory is None:
+            return TripPlans.from_file(path, bounds=bounds, max_clients=max_clients, sampler=sampler)
+
+        def build():
+            plans = TripPlans.from_file(path)
+            return {"ids": np.array(plans.ids, dtype=str), "x": plans.x, "y": plans.y,
+                    "durations": plans.durations, "offsets": plans.offsets}
+        arrays = self.load("plans", path, build)
+        plans = TripPlans(arrays["ids"], arrays["x"], arrays["y"], arrays["durations"], arrays["offsets"])
+        return plans.sample(bounds=bounds, max_clients=max_clients, sampler=sampler)
+
+    def load_celltowers(self, path):
+        """Loads the coordinates and antennas of the cell towers
+
+        Args:
+            path (str|Path): Path of the cell tower shapefile
+
+        Returns:
+            ndarray: x coordinates in GK4/EPSG:31468
+            ndarray: y coordinates in GK4/EPSG:31468
+            ndarray: Amount of antennas, 0 for towers without antennas
+        """
+        def build():
+            towers = gpd.read_file(path)
+            return {"x": towers.geometry.x.to_numpy(dtype=np.float64),
+                    "y": towers.geometry.y.to_numpy(dtype=np.float64),
+                    "antennas": towers["Antennas"].fillna(0).to_numpy(dtype=np.int64)}
+        arrays = self.load("celltowers", path, build)
+        return arrays["x"], arrays["y"], arrays["antennas"]
@@ -0,0 +1,96 @@
+import heapq
+import math
+
+
+class SlotManager(object):
+    def __init__(self, env, node, slots, expiry=2):
+        """Manages the connected clients of a Fog Node
+        Clients are kept in a dict with the time of their last message, so refreshing a client is O(1)
+        Clients idle for more than the expiry are evicted right after their exact expiry time by a single timer, which fires after the earliest expiry of a heap
+        The heap holds one entry per client, refreshed clients are pushed back with their new expiry when their entry comes up
+
+        Args:
+            env (FogEnvironment): Fog Environment of the simulation
+            node (FogNode): The Fog Node the slots belong to
+            slots (int|float): Amount of slots, float('inf') for unlimited slots
+            expiry (float, optional): Seconds after the last message of a client until its slot is freed. Defaults to 2.
+        """
+        self.env = env
+        self.node = node
+        self.slots = slots
+        self.expiry = expiry
+        # Client ID -> time of the last message
+        self.last_seen = {}
+        # (expiry time, client ID)
+        self.heap = []
+        self.free_slots = slots
+        # Time the pending timer fires or None if no timer is pending
+        self.timer = None
+
+    def __len__(self):
+        return len(self.last_seen)
+
+    def __contains__(self, client_id):
+        return client_id in self.last_seen
+
+    def __iter__(self):
+        return iter(self.last_seen)
+
+    def refresh(self, client_id):
+        """Refreshes a connected client or connects a new client if there is a free slot
+        The load of the node is updated in the environment if a client is connected
+
+        Args:
+            client_id (int): ID of the client
+
+        Returns:
+            boolean: Whether the client is connected to the node
+        """
+        if client_id in self.last_seen:
+            self.last_seen[client_id] = self.env.now
+            return True
+        if self.free_slots <= 0:
+            return False
+        self.last_seen[client_id] = self.env.now
+        self.free_slots -= 1
+        heapq.heappush(self.heap, (self.env.now + self.expiry, client_id))
+        self.schedule()
+        self.env.update_node_load(self.node)
+        return True
+
+    def schedule(self):
+        """Starts the timer for the earliest expiry if no timer is pending
+        The timer fires at the first time after the expiry, a client is still connected at exactly its expiry time
+        """
+        if self.timer is not None or not self.heap:
+            return
+        self.timer = self.heap[0][0]
+        delay = max(0, math.nextafter(self.timer, math.inf) - self.env.now)
+        # The difference can be rounded down if the current time is much smaller than the expiry
+        while self.env.now + delay <= self.timer:
+            delay = math.nextafter(delay, math.inf)
+        event = self.env.timeout(delay)
+        event.callbacks.append(self.expire)
+
+    def expire(self, event):
+        """Callback of the timer, evicts all clients whose expiry time has passed
+
+        Args:
+            event (simpy.Event): The timer
+        """
+        self.timer = None
+        now = self.env.now
+        evicted = False
+        while self.heap and self.heap[0][0] < now:
+            _, client_id = heapq.heappop(self.heap)
+            expiry_time = self.last_seen[client_id] + self.expiry
+            # The client sent a message since the entry was pushed
+            if expiry_time >= now:
+                heapq.heappush(self.heap, (expiry_time, client_id))
+            else:
+                del self.last_seen[client_id]
+                self.free_slots += 1
+                evicted = True
+        if evicted:
+            self.env.update_node_load(self.node)
+        self.schedule()
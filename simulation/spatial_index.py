@@ -0,0 +1,110 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class CelltowerIndex(object):
+    def __init__(self, celltowers):
+        """Static spatial index over the cell towers of the simulation
+        Cell towers never move, so the KD-tree is built once after placement and answers nearest tower queries in O(log n)
+
+        Args:
+            celltowers (list): List of {"id", "obj"} entries of the cell towers
+
+        Raises:
+            ValueError: If there are no cell towers to be indexed
+        """
+        if not celltowers:
+            raise ValueError("Cannot build a cell tower index without cell towers")
+        self.ids = [celltower["id"] for celltower in celltowers]
+        coordinates = [celltower["obj"].get_coordinates()
+                       for celltower in celltowers]
+        self.x = np.array([coordinate[0] for coordinate in coordinates], dtype=np.float64)
+        self.y = np.array([coordinate[1] for coordinate in coordinates], dtype=np.float64)
+        self.tree = cKDTree(np.column_stack((self.x, self.y)))
+
+    def nearest(self, x, y):
+        """Searches the nearest cell tower for a single point
+
+        Args:
+            x (float): x coordinate in GK4/EPSG:31468
+            y (float): y coordinate in GK4/EPSG:31468
+
+        Returns:
+            uuid: ID of the nearest cell tower
+            float: Distance between the point and the cell tower in meters
+        """
+        _, idx = self.tree.query((x, y))
+        # Recalculate the distance the same way FogEnvironment.get_distance does to keep latencies unchanged
+        distance = np.sqrt((self.x[idx] - x)**2 + (self.y[idx] - y)**2)
+        return self.ids[idx], float(distance)
+
+    def nearest_many(self, xs, ys):
+        """Searches the nearest cell tower for many points at once
+
+        Args:
+            xs (array-like): x coordinates in GK4/EPSG:31468
+            ys (array-like): y coordinates in GK4/EPSG:31468
+
+        Returns:
+            ndarray: Indices of the nearest cell towers into self.ids
+            ndarray: Distances between the points and their cell towers in meters
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        _, idx = self.tree.query(np.column_stack((xs, ys)))
+        distances = np.sqrt((self.x[idx] - xs)**2 + (self.y[idx] - ys)**2)
+        return idx, distances
+
+
+class NodeIndex(object):
+    def __init__(self, nodes, k=4):
+        """Static spatial index over the Fog Nodes of the simulation
+        Computes the k nearest physical neighbours of every node in one bulk query, so each node looks up its neighbours in O(1)
+
+        Args:
+            nodes (list): List of {"id", "obj"} entries of the Fog Nodes
+            k (int, optional): Amount of neighbours per node. Defaults to 4 as proposed by Dabek et. al.
+        """
+        self.ids = [node["id"] for node in nodes]
+        self.node_index = {node_id: idx for idx, node_id in enumerate(self.ids)}
+        coordinates = np.array([node["obj"].get_coordinates()
+                                for node in nodes], dtype=np.float64).reshape(-1, 2)
+        self.tree = cKDTree(coordinates) if len(nodes) else None
+        self.compute_neighbours(k)
+
+    def compute_neighbours(self, k):
+        """Computes the k nearest neighbours of all nodes, the node itself is not part of its neighbours
+
+        Args:
+            k (int): Amount of neighbours per node
+        """
+        self.k = k
+        self.neighbour_idx = []
+        self.neighbour_dist = []
+        if self.tree is None:
+            return
+        # Query one more, as every node finds itself at distance 0
+        distances, indices = self.tree.query(
+            self.tree.data, k=min(k + 1, len(self.ids)))
+        distances = distances.reshape(len(self.ids), -1)
+        indices = indices.reshape(len(self.ids), -1)
+        for idx in range(len(self.ids)):
+            mask = indices[idx] != idx
+            self.neighbour_idx.append(indices[idx][mask][:k])
+            self.neighbour_dist.append(distances[idx][mask][:k])
+
+    def neighbours(self, node_id, n):
+        """Returns the n nearest physical neighbours of a node, recomputes the index if more than the precomputed neighbours are requested
+
+        Args:
+            node_id (uuid): ID of the node
+            n (int): Amount of neighbours
+
+        Returns:
+            list: {"id", "distance"} entries of the neighbours sorted by distance ascending
+        """
+        if n > self.k:
+            self.compute_neighbours(n)
+        idx = self.node_index[node_id]
+        return [{"id": self.ids[neighbour], "distance": float(distance)}
+                for neighbour, distance in zip(self.neighbour_idx[idx][:n], self.neighbour_dist[idx][:n])]
@@ -25,10 +25,8 @@ def visualize_movements(env, EPSG="EPSG:31468"):
     plt.draw()
     while True:
 
-        client_x = [client["obj"].get_coordinates()[0]
-                    for client in env.clients]
-        client_y = [client["obj"].get_coordinates()[1]
-                    for client in env.clients]
+        client_x, client_y = env.get_client_coordinates(
+            [client["id"] for client in env.clients])
         node_x = [node["obj"].get_coordinates()[0]
                   for node in env.nodes]
         node_y = [node["obj"].get_coordinates()[1]
@@ -56,11 +54,10 @@ def unique_discovery_over_time(env, runtime):
     plt.ylim(0, 30)
     plt.draw()
     while True:
-        discoveries = []
-        for node in env.nodes:
-            discovery = [message.body for message in node.get('obj').out_msg_history if message.msg_type == 2 and message.timestamp > env.now-1]
-            discoveries = discoveries + list(set(discovery) - set(discoveries))
-        performance_i = len(set(discoveries))
+        log = env.message_log
+        recent = (log.column("timestamp") > env.now - 1) & (log.column("msg_type") == 2) & np.isin(
+            log.column("send_id"), [node["id"] for node in env.nodes])
+        performance_i = len(np.unique(log.column("discovered_node")[recent]))
         hl.set_xdata(np.append(hl.get_xdata(), env.now))
         hl.set_ydata(np.append(hl.get_ydata(), performance_i))
 
@@ -87,7 +84,7 @@ def visualize_reconnections_over_time(env, runtime):
         performance_i = 0
         for client in env.clients:
             if client["obj"].out_msg_history and len(client["obj"].out_msg_history)>5:
-                performance_i += sum((1 for message in client["obj"].out_msg_history[-5:] if message.msg_type == 2 and message.timestamp > env.now - 1))
+                performance_i += sum((1 for message in list(client["obj"].out_msg_history)[-5:] if message.msg_type == 2 and message.timestamp > env.now - 1))
                 # performance_i = [msg for msg in client["obj"].out_msg_history[-5] if message.msg_type == 2 and message.timestamp > self.env.now - 1]
                 # performance_i += len(performance_i)
         hl.set_xdata(np.append(hl.get_xdata(), env.now))